@@ -1,63 +1,1753 @@
+import time
+
+# Instante do início do carregamento, para medir o tempo de inicialização
+INICIO_CARREGAMENTO = time.perf_counter()
+
+import argparse
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog, simpledialog
 import datetime
 import base64
 import os
 import hashlib
+import importlib
+import importlib.util
+import math
 import random
 import json
+import multiprocessing
+import platform
+import queue
+import shutil
+import signal
+import sqlite3
+import struct
+import sys
+import tempfile
 import threading
-import time
 import webbrowser
-from cryptography.fernet import Fernet
+import zlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Bibliotecas opcionais (matplotlib, winsound, pyserial) são importadas sob demanda
+ORCAMENTO_INICIALIZACAO = 1.5  # segundos até a primeira janela ficar pronta
+_modulos_opcionais = {}
+_modulos_instalados = {}
+
+
+def modulo_disponivel(nome):
+    """Verificar se um módulo opcional está instalado, sem importá-lo"""
+    if nome not in _modulos_instalados:
+        try:
+            _modulos_instalados[nome] = importlib.util.find_spec(nome) is not None
+        except (ImportError, ValueError):
+            _modulos_instalados[nome] = False
+    return _modulos_instalados[nome]
+
+
+def importar_opcional(nome):
+    """Importar um módulo opcional no primeiro uso; None se não estiver disponível"""
+    if nome not in _modulos_opcionais:
+        try:
+            _modulos_opcionais[nome] = importlib.import_module(nome)
+        except ImportError:
+            _modulos_opcionais[nome] = None
+    return _modulos_opcionais[nome]
+
+
+# Medição de tempo por fase do processamento (desligada por padrão)
+FASES_PROCESSAMENTO = ("leitura", "compressao", "criptografia", "backup", "escrita", "interface")
+FAIXAS_HISTOGRAMA = 24  # faixas em potências de 2 de microssegundos (a última acumula >= ~4 s)
+
+
+class _SemMedicao:
+    """Contexto vazio devolvido quando a medição está desligada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        return False
+
+
+_SEM_MEDICAO = _SemMedicao()
+
+
+class _Medicao:
+    __slots__ = ("cronometro", "fase", "inicio")
+
+    def __init__(self, cronometro, fase):
+        self.cronometro = cronometro
+        self.fase = fase
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        self.cronometro.registrar(self.fase, time.perf_counter() - self.inicio)
+        return False
 
-# Tentar importar bibliotecas adicionais
-try:
-    import matplotlib.pyplot as plt
-    import numpy as np
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    from matplotlib.figure import Figure
 
-    matplotlib_disponivel = True
-except ImportError:
-    matplotlib_disponivel = False
+class CronometroFases:
+    def __init__(self):
+        self.ativo = False
+        self.trava = threading.Lock()
+        self.dados = {}  # fase -> [total em segundos, contagem, faixas do histograma]
+
+    def medir(self, fase):
+        """Contexto que mede a fase; quase sem custo quando desligado"""
+        if not self.ativo:
+            return _SEM_MEDICAO
+        return _Medicao(self, fase)
+
+    def registrar(self, fase, segundos):
+        faixa = min(FAIXAS_HISTOGRAMA - 1, int(segundos * 1000000).bit_length())
+        with self.trava:
+            dados = self.dados.get(fase)
+            if dados is None:
+                dados = self.dados[fase] = [0.0, 0, [0] * FAIXAS_HISTOGRAMA]
+            dados[0] += segundos
+            dados[1] += 1
+            dados[2][faixa] += 1
+
+    def drenar(self):
+        """Retornar e zerar as medições (levadas dos processos do pool ao principal)"""
+        with self.trava:
+            dados, self.dados = self.dados, {}
+        return dados
+
+    def mesclar(self, dados):
+        """Somar medições vindas de outro processo"""
+        if not dados:
+            return
+        with self.trava:
+            for fase, (total, contagem, faixas) in dados.items():
+                atual = self.dados.setdefault(fase, [0.0, 0, [0] * FAIXAS_HISTOGRAMA])
+                atual[0] += total
+                atual[1] += contagem
+                atual[2] = [a + b for a, b in zip(atual[2], faixas)]
+
+    def resumo(self):
+        """Totais e histograma por fase, prontos para exibir ou exportar em JSON"""
+        with self.trava:
+            dados = {fase: (total, contagem, list(faixas)) for fase, (total, contagem, faixas) in self.dados.items()}
+
+        resumo = {}
+        for fase in sorted(dados, key=lambda f: FASES_PROCESSAMENTO.index(f) if f in FASES_PROCESSAMENTO else 99):
+            total, contagem, faixas = dados[fase]
+            resumo[fase] = {
+                'segundos': round(total, 6),
+                'medicoes': contagem,
+                'media_ms': round(total / contagem * 1000, 3) if contagem else 0,
+                # Faixa i: duração abaixo de 2**i microssegundos
+                'histograma_us': {f"<{2 ** i}": quantidade for i, quantidade in enumerate(faixas) if quantidade}
+            }
+        return resumo
+
+    def limpar(self):
+        with self.trava:
+            self.dados = {}
+
+
+# Instância usada por todo o pipeline de arquivos
+cronometro = CronometroFases()
+
+
+# Chaves de criptografia de arquivos
+ARQUIVO_CHAVE = "chave.key"
+ARQUIVO_CHAVEIRO = "chaveiro.key"  # chaves antigas, uma por linha
+
+
+def carregar_chave(caminho=ARQUIVO_CHAVE):
+    """Carregar chave de criptografia, gerando uma nova se não existir"""
+    try:
+        with open(caminho, "rb") as arquivo_chave:
+            return arquivo_chave.read()
+    except FileNotFoundError:
+        chave = Fernet.generate_key()
+        with open(caminho, "wb") as arquivo_chave:
+            arquivo_chave.write(chave)
+        return chave
+
+
+def identificar_chave(chave):
+    """Impressão digital curta (8 bytes) gravada no cabeçalho dos arquivos"""
+    return hashlib.sha256(b"CryptographiE id de chave" + chave.strip()).digest()[:8]
+
+
+# Chaveiro com a chave atual e todas as chaves históricas, indexadas pelo id
+class Chaveiro:
+    def __init__(self, chave_atual, chaves_antigas=()):
+        self.chave_atual = chave_atual.strip()
+        self.chaves = {identificar_chave(chave): chave.strip() for chave in chaves_antigas}
+        self.chaves[identificar_chave(self.chave_atual)] = self.chave_atual
+
+    def __len__(self):
+        return len(self.chaves)
+
+    def obter(self, id_chave):
+        """Selecionar a chave pelo id do cabeçalho (arquivos sem id usam a chave atual)"""
+        if id_chave is None:
+            return self.chave_atual
+        try:
+            return self.chaves[id_chave]
+        except KeyError:
+            raise ValueError(f"Chave {id_chave.hex()} não encontrada no chaveiro")
+
+    def fernet(self):
+        """MultiFernet para tokens legados, que não trazem o id da chave"""
+        antigas = [Fernet(chave) for chave in self.chaves.values() if chave != self.chave_atual]
+        return MultiFernet([Fernet(self.chave_atual)] + antigas)
+
+
+def como_chaveiro(chave):
+    """Aceitar tanto uma chave avulsa quanto um Chaveiro"""
+    return chave if isinstance(chave, Chaveiro) else Chaveiro(chave)
+
+
+def carregar_chaveiro(caminho_chave=ARQUIVO_CHAVE, caminho_chaveiro=ARQUIVO_CHAVEIRO):
+    """Carregar a chave atual e as chaves arquivadas"""
+    chaves_antigas = []
+    try:
+        with open(caminho_chaveiro, "rb") as arquivo:
+            chaves_antigas = [linha.strip() for linha in arquivo if linha.strip()]
+    except FileNotFoundError:
+        pass
+    return Chaveiro(carregar_chave(caminho_chave), chaves_antigas)
+
+
+def arquivar_chave(chave, caminho_chaveiro=ARQUIVO_CHAVEIRO):
+    """Guardar uma chave no chaveiro antes de ela ser substituída"""
+    with open(caminho_chaveiro, "ab") as arquivo:
+        arquivo.write(chave.strip() + b"\n")
+
+
+# Compressão opcional antes da criptografia (codec gravado nas flags do cabeçalho)
+COMPRESSAO_ZLIB = 1
+COMPRESSAO_LZMA = 2
+MASCARA_COMPRESSAO = 0x03
+CODECS_COMPRESSAO = {'zlib': COMPRESSAO_ZLIB, 'lzma': COMPRESSAO_LZMA}
+NOMES_COMPRESSAO = {codigo: nome for nome, codigo in CODECS_COMPRESSAO.items()}
+TAMANHO_AMOSTRA_ENTROPIA = 128 * 1024  # primeiros blocos do arquivo
+TAMANHO_MINIMO_COMPRESSAO = 4 * 1024
+LIMITE_ENTROPIA = 7.5  # bits por byte; acima disso o conteúdo já está comprimido ou é aleatório
+LIMITE_SAIDA_DESCOMPRESSAO = 4 * 1024 * 1024  # memória máxima por chamada ao descompressor
+
+
+def _modulo_compressao(codigo):
+    """Módulo do codec (lzma pode faltar em algumas instalações do Python)"""
+    modulo = zlib if codigo == COMPRESSAO_ZLIB else importar_opcional("lzma")
+    if modulo is None:
+        raise ValueError(f"Compressão {NOMES_COMPRESSAO.get(codigo, codigo)} indisponível nesta instalação")
+    return modulo
+
+
+def entropia_amostra(dados):
+    """Entropia de Shannon da amostra, em bits por byte"""
+    total = len(dados)
+    return -sum(n / total * math.log2(n / total) for n in Counter(dados).values())
+
+
+def escolher_compressao(caminho, compressao):
+    """Código do codec a usar no arquivo, ou 0 se a amostra indicar que não vale a pena comprimir"""
+    if not compressao:
+        return 0
+    if compressao not in CODECS_COMPRESSAO:
+        raise ValueError(f"Compressão desconhecida: {compressao}")
+
+    with open(caminho, "rb") as f:
+        amostra = f.read(TAMANHO_AMOSTRA_ENTROPIA)
+    if len(amostra) < TAMANHO_MINIMO_COMPRESSAO or entropia_amostra(amostra) > LIMITE_ENTROPIA:
+        return 0
+    return CODECS_COMPRESSAO[compressao]
+
+
+class FluxoComprimido:
+    """Leitor que entrega o conteúdo da origem já comprimido"""
+
+    fase = "compressao"  # medida junto com a leitura da origem
+
+    def __init__(self, origem, codigo):
+        modulo = _modulo_compressao(codigo)
+        self.origem = origem
+        self.compressor = modulo.compressobj(6) if codigo == COMPRESSAO_ZLIB else modulo.LZMACompressor()
+        self.buffer = bytearray()
+        self.lidos = 0
+        self.fim = False
+
+    def read(self, tamanho):
+        while len(self.buffer) < tamanho and not self.fim:
+            bloco = self.origem.read(TAMANHO_SEGMENTO_PADRAO)
+            if bloco:
+                self.lidos += len(bloco)
+                self.buffer += self.compressor.compress(bloco)
+            else:
+                self.buffer += self.compressor.flush()
+                self.fim = True
+
+        dados = bytes(self.buffer[:tamanho])
+        del self.buffer[:tamanho]
+        return dados
+
+
+class DestinoDescomprimido:
+    """Escritor que descomprime o conteúdo antes de gravá-lo no destino, com memória limitada"""
+
+    fase = "compressao"  # medida junto com a escrita no destino
+
+    def __init__(self, destino, codigo):
+        modulo = _modulo_compressao(codigo)
+        self.destino = destino
+        self.zlib = codigo == COMPRESSAO_ZLIB
+        self.descompressor = modulo.decompressobj() if self.zlib else modulo.LZMADecompressor()
+        self.escritos = 0
+
+    def _gravar(self, parte):
+        self.destino.write(parte)
+        self.escritos += len(parte)
+
+    def write(self, dados):
+        if self.zlib:
+            while True:
+                parte = self.descompressor.decompress(dados, LIMITE_SAIDA_DESCOMPRESSAO)
+                dados = self.descompressor.unconsumed_tail
+                self._gravar(parte)
+                if not dados and len(parte) < LIMITE_SAIDA_DESCOMPRESSAO:
+                    return
+        else:
+            self._gravar(self.descompressor.decompress(dados, LIMITE_SAIDA_DESCOMPRESSAO))
+            while not self.descompressor.needs_input and not self.descompressor.eof:
+                self._gravar(self.descompressor.decompress(b"", LIMITE_SAIDA_DESCOMPRESSAO))
+
+    def finalizar(self):
+        """Confirmar que o fluxo comprimido terminou exatamente no fim do contêiner"""
+        if not self.descompressor.eof or self.descompressor.unused_data:
+            raise ValueError("Conteúdo comprimido incompleto ou corrompido")
+        return self.escritos
+
+
+# Formato de contêiner para arquivos (segmentos autenticados em fluxo)
+# Cabeçalho: mágico, versão, flags, tamanho do segmento, prefixo do nonce, id da chave, sal
+MAGICO_CONTEINER = b"CRYE"
+VERSAO_CONTEINER = 4
+CABECALHO_CONTEINER = struct.Struct(">4sBBI7s8s32s")
+CABECALHO_CONTEINER_V2 = struct.Struct(">4sBBI7s8s")  # sem sal: chave AES única por chave Fernet
+CABECALHO_CONTEINER_V1 = struct.Struct(">4sBBI7s")  # sem id da chave
+# A versão 3 é a 2 com compressão (versões antigas recusam em vez de gravar o fluxo comprimido)
+CABECALHOS_CONTEINER = {1: CABECALHO_CONTEINER_V1, 2: CABECALHO_CONTEINER_V2, 3: CABECALHO_CONTEINER_V2,
+                        4: CABECALHO_CONTEINER}
+TAMANHO_SAL_CONTEINER = 32
+TAMANHO_SEGMENTO_PADRAO = 1024 * 1024
+TAMANHO_SEGMENTO_MAXIMO = 64 * 1024 * 1024
+TAMANHO_TAG = 16
+
+# Arquivos a partir deste tamanho são divididos entre vários processos
+LIMITE_SEGMENTOS_PARALELOS = 64 * 1024 * 1024
+
+
+def derivar_chave_conteiner(chave, sal=None):
+    """Derivar a chave AES-256-GCM do contêiner a partir da chave Fernet
+
+    Desde a versão 4 o sal aleatório do cabeçalho dá a cada arquivo a sua própria chave,
+    então o prefixo de nonce de 7 bytes só precisa ser único dentro do arquivo.
+    """
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=sal,
+        info=b"CryptographiE conteiner v4" if sal else b"CryptographiE conteiner v1",
+    )
+    return hkdf.derive(base64.urlsafe_b64decode(chave))
+
+
+def aes_conteiner(chave, info):
+    """Cifra AES-GCM do contêiner descrito pelo cabeçalho `info`"""
+    return AESGCM(derivar_chave_conteiner(chave, info['sal']))
+
+
+def nonce_segmento(prefixo, indice, ultimo):
+    """Montar o nonce de um segmento (prefixo + contador + marcador de último)"""
+    return prefixo + struct.pack(">IB", indice, 1 if ultimo else 0)
+
+
+def montar_cabecalho(chave, tamanho_segmento=TAMANHO_SEGMENTO_PADRAO, flags=0):
+    """Montar o cabeçalho de um novo contêiner com prefixo de nonce e sal aleatórios"""
+    return CABECALHO_CONTEINER.pack(MAGICO_CONTEINER, VERSAO_CONTEINER, flags, tamanho_segmento,
+                                    os.urandom(7), identificar_chave(chave), os.urandom(TAMANHO_SAL_CONTEINER))
+
+
+def desempacotar_cabecalho(bruto):
+    """Validar o cabeçalho bruto e retornar seus campos"""
+    if bruto[:4] != MAGICO_CONTEINER or len(bruto) < 5:
+        raise ValueError("Arquivo não está no formato de contêiner")
+
+    versao = bruto[4]
+    formato = CABECALHOS_CONTEINER.get(versao)
+    if formato is None:
+        raise ValueError(f"Versão de contêiner não suportada: {versao}")
+    if len(bruto) < formato.size:
+        raise ValueError("Cabeçalho do contêiner incompleto")
+
+    campos = formato.unpack(bruto[:formato.size])
+    tamanho_segmento = campos[3]
+    if not 0 < tamanho_segmento <= TAMANHO_SEGMENTO_MAXIMO:
+        raise ValueError(f"Tamanho de segmento inválido: {tamanho_segmento}")
+
+    flags = campos[2]
+    compressao = flags & MASCARA_COMPRESSAO
+    if flags & ~MASCARA_COMPRESSAO or (compressao and compressao not in NOMES_COMPRESSAO):
+        raise ValueError(f"Flags de contêiner não suportadas: {flags:#04x}")
+
+    return {
+        'versao': versao,
+        'flags': flags,
+        'compressao': compressao,
+        'tamanho_segmento': tamanho_segmento,
+        'prefixo': campos[4],
+        'id_chave': campos[5] if len(campos) > 5 else None,
+        'sal': campos[6] if len(campos) > 6 else None,
+        'tamanho_cabecalho': formato.size,
+        'bruto': bruto[:formato.size]
+    }
+
+
+def ler_cabecalho_conteiner(origem):
+    """Ler e validar o cabeçalho do contêiner"""
+    bruto = origem.read(5)
+    formato = CABECALHOS_CONTEINER.get(bruto[4]) if len(bruto) == 5 else None
+    if formato is not None:
+        bruto += origem.read(formato.size - 5)
+    return desempacotar_cabecalho(bruto)
+
+
+def criptografar_fluxo(origem, destino, chave, tamanho_segmento=TAMANHO_SEGMENTO_PADRAO, compressao=0):
+    """Criptografar um fluxo em segmentos autenticados, com memória constante"""
+    cabecalho = montar_cabecalho(chave, tamanho_segmento, compressao)
+    info = desempacotar_cabecalho(cabecalho)
+    aes = aes_conteiner(chave, info)
+    prefixo = info['prefixo']
+    destino.write(cabecalho)
+
+    if compressao:
+        origem = FluxoComprimido(origem, compressao)
+    fase_leitura = getattr(origem, 'fase', "leitura")
+
+    total = 0
+    indice = 0
+    with cronometro.medir(fase_leitura):
+        atual = origem.read(tamanho_segmento)
+    while True:
+        # Ler um segmento à frente para saber se o atual é o último
+        with cronometro.medir(fase_leitura):
+            proximo = origem.read(tamanho_segmento) if len(atual) == tamanho_segmento else b""
+        ultimo = not proximo
+
+        # O cabeçalho entra como dado associado de todos os segmentos
+        with cronometro.medir("criptografia"):
+            segmento = aes.encrypt(nonce_segmento(prefixo, indice, ultimo), atual, cabecalho)
+        with cronometro.medir("escrita"):
+            destino.write(segmento)
+        total += len(atual)
+
+        if ultimo:
+            # Com compressão, o tamanho original é o que foi lido da origem
+            return origem.lidos if compressao else total
+        atual = proximo
+        indice += 1
+
+
+def descriptografar_fluxo(origem, destino, chaveiro):
+    """Descriptografar um fluxo no formato de contêiner, segmento a segmento"""
+    info = ler_cabecalho_conteiner(origem)
+    # A chave certa é escolhida pelo id do cabeçalho, sem tentativa e erro
+    chave = como_chaveiro(chaveiro).obter(info['id_chave'])
+    aes = aes_conteiner(chave, info)
+    tamanho_bloco = info['tamanho_segmento'] + TAMANHO_TAG
+
+    if info['compressao']:
+        destino = DestinoDescomprimido(destino, info['compressao'])
+    fase_escrita = getattr(destino, 'fase', "escrita")
+
+    total = 0
+    indice = 0
+    with cronometro.medir("leitura"):
+        atual = origem.read(tamanho_bloco)
+    while True:
+        with cronometro.medir("leitura"):
+            proximo = origem.read(tamanho_bloco) if len(atual) == tamanho_bloco else b""
+        ultimo = not proximo
+
+        if len(atual) < TAMANHO_TAG:
+            raise ValueError("Contêiner truncado")
+
+        with cronometro.medir("criptografia"):
+            conteudo = aes.decrypt(nonce_segmento(info['prefixo'], indice, ultimo), atual, info['bruto'])
+        with cronometro.medir(fase_escrita):
+            destino.write(conteudo)
+        total += len(conteudo)
+
+        if ultimo:
+            return destino.finalizar() if info['compressao'] else total
+        atual = proximo
+        indice += 1
+
+
+def _copiar_metadados(origem, destino):
+    """Copiar dono e grupo (quando permitido), permissões, datas, flags e xattrs"""
+    if hasattr(os, "chown"):
+        info = os.stat(origem)
+        try:
+            os.chown(destino, info.st_uid, info.st_gid)
+        except OSError:
+            pass  # só o superusuário pode transferir o dono
+    # Depois do chown, que pode limpar os bits setuid/setgid
+    shutil.copystat(origem, destino)
+
+
+def _outros_hardlinks(caminho):
+    """Quantidade de outros nomes do arquivo, sem contar o .bak criado por criar_backup"""
+    links = os.stat(caminho).st_nlink - 1
+    backup = caminho + ".bak"
+    if links and os.path.exists(backup) and os.path.samefile(caminho, backup):
+        links -= 1
+    return links
+
+
+def substituir_arquivo(caminho, gerar):
+    """Gerar o novo conteúdo em um arquivo temporário e substituir o original
+
+    Arquivos com outros hardlinks são regravados no próprio inode, para que
+    todos os nomes passem a ver o conteúdo novo. Um link simbólico é seguido:
+    o alvo é substituído e o link continua apontando para ele.
+    """
+    caminho = os.path.realpath(caminho)
+    pasta = os.path.dirname(caminho)
+    fd, temporario = tempfile.mkstemp(prefix=".crye_", suffix=".tmp", dir=pasta)
+    os.close(fd)
+    try:
+        with open(temporario, "wb") as destino:
+            resultado = gerar(destino)
+        with cronometro.medir("escrita"):
+            if _outros_hardlinks(caminho):
+                with open(temporario, "rb") as novo, open(caminho, "r+b") as original:
+                    shutil.copyfileobj(novo, original, TAMANHO_SEGMENTO_PADRAO)
+                    original.truncate()
+                os.remove(temporario)
+            else:
+                _copiar_metadados(caminho, temporario)
+                os.replace(temporario, caminho)
+        return resultado
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+
+
+# Backups sem duplicar os dados: clone reflink, hardlink ou cópia dentro do kernel
+FICLONE = 0x40049409  # ioctl do Linux que clona o arquivo inteiro (btrfs, XFS, bcachefs)
+TAMANHO_BLOCO_COPIA = 64 * 1024 * 1024
+
+
+def _clonar_reflink(origem, destino):
+    """Compartilhar os blocos do original (copy-on-write), sem copiar dados"""
+    fcntl = importar_opcional("fcntl")
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError("reflink indisponível")
+    with open(origem, "rb") as entrada, open(destino, "wb") as saida:
+        fcntl.ioctl(saida.fileno(), FICLONE, entrada.fileno())
+
+
+def _copiar_no_kernel(origem, destino):
+    """Copiar com copy_file_range, sem passar os dados pelo processo"""
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("copy_file_range indisponível")
+    with open(origem, "rb") as entrada, open(destino, "wb") as saida:
+        while os.copy_file_range(entrada.fileno(), saida.fileno(), TAMANHO_BLOCO_COPIA):
+            pass
+
+
+def _copiar_conteudo(origem, destino, tentar_reflink=True):
+    """Copiar por reflink, copy_file_range ou cópia comum e retornar o método usado"""
+    if tentar_reflink:
+        try:
+            _clonar_reflink(origem, destino)
+            return 'reflink'
+        except OSError:
+            pass
+    try:
+        _copiar_no_kernel(origem, destino)
+        return 'copy_file_range'
+    except OSError:
+        shutil.copyfile(origem, destino)
+        return 'copia'
+
+
+def criar_backup(caminho, permitir_hardlink=False, origem=None):
+    """Criar caminho + '.bak' pelo método mais barato disponível e retornar o método usado
+
+    O hardlink só é seguro quando o original será substituído por os.replace
+    (como em substituir_arquivo): o .bak fica com o inode antigo, intacto.
+    Arquivos que já têm outros hardlinks são regravados no próprio inode, então
+    recebem uma cópia. `origem` permite copiar de outro arquivo (padrão: o próprio).
+    """
+    destino = caminho + ".bak"
+    origem = origem or caminho
+    # Link simbólico: o hardlink seria do alvo, que não se chama caminho + '.bak'; o alvo
+    # pareceria ter outro nome e seria regravado no próprio inode, levando o .bak junto
+    permitir_hardlink = permitir_hardlink and not os.path.islink(caminho) and os.stat(origem).st_nlink == 1
+    fd, temporario = tempfile.mkstemp(prefix=".crye_", suffix=".bak", dir=os.path.dirname(os.path.abspath(caminho)))
+    os.close(fd)
+
+    try:
+        metodo = None
+        try:
+            _clonar_reflink(origem, temporario)
+            metodo = 'reflink'
+        except OSError:
+            pass
+
+        if metodo is None and permitir_hardlink:
+            try:
+                os.remove(temporario)
+                os.link(origem, temporario)
+                metodo = 'hardlink'
+            except OSError:
+                pass
+
+        if metodo is None:
+            metodo = _copiar_conteudo(origem, temporario, tentar_reflink=False)
+
+        # O hardlink já compartilha permissões e datas com o original
+        if metodo != 'hardlink':
+            _copiar_metadados(origem, temporario)
+        os.replace(temporario, destino)
+        return metodo
+    finally:
+        # os.replace não remove a origem quando ela já é um hardlink do destino
+        if os.path.lexists(temporario):
+            os.remove(temporario)
+
+
+# Detecção rápida de arquivos já criptografados
+TAMANHO_AMOSTRA_FORMATO = 64
+TAMANHO_MINIMO_FERNET = 100  # token vazio: 73 bytes em base64
+TAMANHO_FIXO_FERNET = 57  # versão, instante, IV e HMAC; o resto são blocos AES de 16 bytes
+CARACTERES_BASE64_URL = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+ALFABETO_BASE64_URL = frozenset(CARACTERES_BASE64_URL + b"=")
+FORMATOS_CRIPTOGRAFADOS = ('conteiner', 'fernet')
+# Arquivos que só parecem criptografados: processados como texto comum, com aviso
+AVISOS_FORMATO = {
+    'possivel_conteiner': "possivelmente criptografado: começa com CRYE, mas o cabeçalho ou o tamanho não conferem",
+    'possivel_fernet': "possivelmente criptografado: começa como token Fernet, mas a estrutura não confere"
+}
+
+
+def _estrutura_fernet(f, tamanho):
+    """Conferir no arquivo inteiro a forma de um token Fernet: só base64 e tamanho 57 + 16n"""
+    f.seek(max(0, tamanho - 2))
+    fim = f.read(2)
+    preenchimento = len(fim) - len(fim.rstrip(b"="))
+    decodificado = tamanho // 4 * 3 - preenchimento
+    if decodificado <= TAMANHO_FIXO_FERNET or (decodificado - TAMANHO_FIXO_FERNET) % 16:
+        return False
+
+    f.seek(0)
+    restante = tamanho - preenchimento
+    while restante > 0:
+        bloco = f.read(min(TAMANHO_SEGMENTO_PADRAO, restante))
+        if not bloco or bloco.translate(None, CARACTERES_BASE64_URL):
+            return False
+        restante -= len(bloco)
+    return True
+
+
+def detectar_formato(caminho):
+    """Identificar se o arquivo já está criptografado ('conteiner', 'fernet' ou None)
+
+    Um arquivo que começa como contêiner ou token Fernet mas não tem a estrutura
+    completa de um retorna 'possivel_conteiner' ou 'possivel_fernet' (ver AVISOS_FORMATO).
+    """
+    with open(caminho, "rb") as f:
+        inicio = f.read(TAMANHO_AMOSTRA_FORMATO)
+        tamanho = os.fstat(f.fileno()).st_size
+
+        if inicio.startswith(MAGICO_CONTEINER):
+            # Texto comum também pode começar com "CRYE": o cabeçalho inteiro e o tamanho precisam conferir
+            try:
+                geometria_conteiner(desempacotar_cabecalho(inicio), tamanho)
+            except ValueError:
+                return 'possivel_conteiner'
+            return 'conteiner'
+
+        # Token Fernet legado: base64 com tamanho múltiplo de 4 e byte de versão 0x80
+        # (os 4 primeiros caracteres sem '=', para decodificarem sempre em 3 bytes)
+        if (tamanho >= TAMANHO_MINIMO_FERNET and tamanho % 4 == 0
+                and ALFABETO_BASE64_URL.issuperset(inicio)
+                and not inicio[:4].translate(None, CARACTERES_BASE64_URL)
+                and base64.urlsafe_b64decode(inicio[:4])[0] == 0x80):
+            return 'fernet' if _estrutura_fernet(f, tamanho) else 'possivel_fernet'
+
+    return None
+
+
+def _ler_posicional(fd, tamanho, posicao):
+    """Ler exatamente `tamanho` bytes a partir de `posicao` (ou até o fim do arquivo)"""
+    partes = []
+    while tamanho > 0:
+        dados = os.pread(fd, tamanho, posicao)
+        if not dados:
+            break
+        partes.append(dados)
+        tamanho -= len(dados)
+        posicao += len(dados)
+    return b"".join(partes)
+
+
+def _escrever_posicional(fd, dados, posicao):
+    """Escrever todos os bytes em `posicao` sem mover o cursor do arquivo"""
+    vista = memoryview(dados)
+    while vista:
+        escrito = os.pwrite(fd, vista, posicao)
+        vista = vista[escrito:]
+        posicao += escrito
+
+
+# Chaveiro carregado em cada processo do pool
+_chaveiro_worker = None
+_compressao_worker = None  # codec pedido para a operação de pasta em andamento
+
+
+def _definir_chaveiro_worker(chaveiro, medir_fases=False):
+    """Definir o chaveiro usado pelos processos de segmentos"""
+    global _chaveiro_worker
+    _chaveiro_worker = chaveiro
+    cronometro.ativo = medir_fases
+
+
+def processar_faixa_segmentos(tarefa):
+    """Processar uma faixa de segmentos com leitura e escrita posicionais (os.pread/os.pwrite)"""
+    operacao, origem, destino, cabecalho, inicio, fim, total_segmentos = tarefa
+    info = desempacotar_cabecalho(cabecalho)
+    aes = aes_conteiner(_chaveiro_worker.obter(info['id_chave']), info)
+    tamanho_segmento = info['tamanho_segmento']
+    tamanho_bloco = tamanho_segmento + TAMANHO_TAG
+
+    fd_origem = os.open(origem, os.O_RDONLY)
+    try:
+        fd_destino = os.open(destino, os.O_WRONLY)
+        try:
+            for indice in range(inicio, fim):
+                nonce = nonce_segmento(info['prefixo'], indice, indice == total_segmentos - 1)
+                if operacao == 'criptografar':
+                    with cronometro.medir("leitura"):
+                        dados = _ler_posicional(fd_origem, tamanho_segmento, indice * tamanho_segmento)
+                    with cronometro.medir("criptografia"):
+                        dados = aes.encrypt(nonce, dados, cabecalho)
+                    with cronometro.medir("escrita"):
+                        _escrever_posicional(fd_destino, dados, info['tamanho_cabecalho'] + indice * tamanho_bloco)
+                else:
+                    with cronometro.medir("leitura"):
+                        dados = _ler_posicional(fd_origem, tamanho_bloco,
+                                                info['tamanho_cabecalho'] + indice * tamanho_bloco)
+                    with cronometro.medir("criptografia"):
+                        dados = aes.decrypt(nonce, dados, cabecalho)
+                    with cronometro.medir("escrita"):
+                        _escrever_posicional(fd_destino, dados, indice * tamanho_segmento)
+        finally:
+            os.close(fd_destino)
+    finally:
+        os.close(fd_origem)
+
+    # Medições do processo voltam ao principal junto com o resultado
+    return cronometro.drenar() if cronometro.ativo else None
+
+
+def geometria_conteiner(info, tamanho_arquivo):
+    """Retornar (tamanho do bloco cifrado, total de segmentos, tamanho original) de um contêiner"""
+    tamanho_bloco = info['tamanho_segmento'] + TAMANHO_TAG
+
+    # O número de segmentos é deduzido do tamanho, pois todos exceto o último são completos
+    corpo = tamanho_arquivo - info['tamanho_cabecalho']
+    total_segmentos = -(-corpo // tamanho_bloco)
+    if total_segmentos < 1 or corpo - (total_segmentos - 1) * tamanho_bloco < TAMANHO_TAG:
+        raise ValueError("Contêiner truncado")
+    return tamanho_bloco, total_segmentos, corpo - total_segmentos * TAMANHO_TAG
+
+
+def processar_segmentos_em_paralelo(caminho, chave, operacao, processos):
+    """Dividir os segmentos de um arquivo grande entre vários processos"""
+    tamanho = os.path.getsize(caminho)
+    chaveiro = como_chaveiro(chave)
+
+    if operacao == 'criptografar':
+        tamanho_segmento = TAMANHO_SEGMENTO_PADRAO
+        cabecalho = montar_cabecalho(chaveiro.chave_atual, tamanho_segmento)
+        total_segmentos = max(1, -(-tamanho // tamanho_segmento))
+        tamanho_final = len(cabecalho) + tamanho + total_segmentos * TAMANHO_TAG
+        tamanho_original = tamanho
+    else:
+        with open(caminho, "rb") as origem:
+            info = ler_cabecalho_conteiner(origem)
+        chaveiro.obter(info['id_chave'])  # falha cedo se a chave não estiver no chaveiro
+        cabecalho = info['bruto']
+        _, total_segmentos, tamanho_final = geometria_conteiner(info, tamanho)
+        tamanho_original = tamanho_final
+
+    def gerar(destino):
+        if operacao == 'criptografar':
+            destino.write(cabecalho)
+        destino.truncate(tamanho_final)
+        destino.flush()
+
+        por_tarefa = max(4, -(-total_segmentos // (processos * 4)))
+        tarefas = [(operacao, caminho, destino.name, cabecalho, inicio,
+                    min(inicio + por_tarefa, total_segmentos), total_segmentos)
+                   for inicio in range(0, total_segmentos, por_tarefa)]
+
+        with multiprocessing.Pool(processos, initializer=_definir_chaveiro_worker,
+                                  initargs=(chaveiro, cronometro.ativo)) as pool:
+            for fases in pool.imap_unordered(processar_faixa_segmentos, tarefas):
+                cronometro.mesclar(fases)
+        return tamanho_original
+
+    return substituir_arquivo(caminho, gerar)
+
+
+def _usar_segmentos_paralelos(caminho, processos):
+    """Decidir se vale a pena dividir o arquivo entre processos"""
+    return (processos > 1 and hasattr(os, "pwrite")
+            and os.path.getsize(caminho) >= LIMITE_SEGMENTOS_PARALELOS)
+
+
+def _conteiner_comprimido(caminho):
+    """Verificar pelo cabeçalho se o contêiner guarda conteúdo comprimido"""
+    with open(caminho, "rb") as origem:
+        return bool(ler_cabecalho_conteiner(origem)['compressao'])
+
+
+def criptografar_arquivo_em_disco(caminho, chave, processos=1, compressao=None):
+    """Criptografar um arquivo no formato de contêiner e retornar o tamanho original"""
+    chave = como_chaveiro(chave).chave_atual
+    codigo = escolher_compressao(caminho, compressao)
+    # O tamanho comprimido só é conhecido no fim, então a divisão em segmentos paralelos fica de fora
+    if not codigo and _usar_segmentos_paralelos(caminho, processos):
+        return processar_segmentos_em_paralelo(caminho, chave, 'criptografar', processos)
+
+    with open(caminho, "rb") as origem:
+        return substituir_arquivo(
+            caminho, lambda destino: criptografar_fluxo(origem, destino, chave, compressao=codigo))
+
+
+def descriptografar_arquivo_em_disco(caminho, chaveiro, processos=1):
+    """Descriptografar um arquivo em contêiner ou token Fernet legado"""
+    chaveiro = como_chaveiro(chaveiro)
+    formato = detectar_formato(caminho)
+    if formato not in FORMATOS_CRIPTOGRAFADOS:
+        raise ValueError("Arquivo não está criptografado")
+
+    if formato == 'conteiner':
+        if _usar_segmentos_paralelos(caminho, processos) and not _conteiner_comprimido(caminho):
+            return processar_segmentos_em_paralelo(caminho, chaveiro, 'descriptografar', processos)
+
+        with open(caminho, "rb") as origem:
+            return substituir_arquivo(caminho, lambda destino: descriptografar_fluxo(origem, destino, chaveiro))
+
+    # Formato legado: token Fernet único com o arquivo inteiro, sem id da chave
+    with open(caminho, "rb") as origem, cronometro.medir("leitura"):
+        token = origem.read()
+    with cronometro.medir("criptografia"):
+        conteudo = chaveiro.fernet().decrypt(token)
+
+    substituir_arquivo(caminho, lambda destino: destino.write(conteudo))
+    return len(conteudo)
+
+
+class _Descarte:
+    """Destino que descarta o conteúdo (verificação sem gravar)"""
+
+    def write(self, dados):
+        return len(dados)
+
+
+def verificar_arquivo_em_disco(caminho, chaveiro):
+    """Conferir a autenticação de todos os segmentos sem alterar o arquivo"""
+    chaveiro = como_chaveiro(chaveiro)
+    formato = detectar_formato(caminho)
+    if formato not in FORMATOS_CRIPTOGRAFADOS:
+        raise ValueError("Arquivo não está criptografado")
+
+    with open(caminho, "rb") as origem:
+        if formato == 'conteiner':
+            return descriptografar_fluxo(origem, _Descarte(), chaveiro)
+        return len(chaveiro.fernet().decrypt(origem.read()))
+
+
+def descriptografar_intervalo(caminho, chaveiro, inicio, tamanho, destino):
+    """Descriptografar só os bytes [inicio, inicio + tamanho) do original, gravando-os em `destino`
+
+    Apenas os segmentos que cobrem o intervalo são lidos e autenticados. Um `inicio`
+    negativo conta a partir do fim; `tamanho` None vai até o fim. Retorna os bytes gravados.
+    """
+    chaveiro = como_chaveiro(chaveiro)
+    if detectar_formato(caminho) != 'conteiner':
+        raise ValueError("Leitura parcial exige um arquivo no formato de contêiner")
+
+    with open(caminho, "rb") as origem:
+        info = ler_cabecalho_conteiner(origem)
+        # Após descomprimir, os segmentos não correspondem mais a posições do original
+        if info['compressao']:
+            raise ValueError("Contêiner comprimido não permite leitura parcial")
+
+        aes = aes_conteiner(chaveiro.obter(info['id_chave']), info)
+        tamanho_bloco, total_segmentos, tamanho_original = geometria_conteiner(
+            info, os.fstat(origem.fileno()).st_size)
+
+        if inicio < 0:
+            inicio = max(0, tamanho_original + inicio)
+        fim = tamanho_original if tamanho is None else min(tamanho_original, inicio + tamanho)
+        if inicio >= fim:
+            return 0
+
+        tamanho_segmento = info['tamanho_segmento']
+        escritos = 0
+        for indice in range(inicio // tamanho_segmento, (fim - 1) // tamanho_segmento + 1):
+            with cronometro.medir("leitura"):
+                origem.seek(info['tamanho_cabecalho'] + indice * tamanho_bloco)
+                bloco = origem.read(tamanho_bloco)
+            # O marcador de último segmento impede que um arquivo truncado passe na autenticação
+            try:
+                with cronometro.medir("criptografia"):
+                    conteudo = aes.decrypt(nonce_segmento(info['prefixo'], indice, indice == total_segmentos - 1),
+                                           bloco, info['bruto'])
+            except InvalidTag:
+                raise ValueError(f"Falha na autenticação do segmento {indice} "
+                                 "(arquivo corrompido, truncado ou chave incorreta)") from None
+
+            deslocamento = indice * tamanho_segmento
+            trecho = conteudo[max(0, inicio - deslocamento):fim - deslocamento]
+            with cronometro.medir("escrita"):
+                destino.write(trecho)
+            escritos += len(trecho)
+        return escritos
+
+
+# Manifesto por pasta para criptografia incremental
+ARQUIVO_MANIFESTO = ".cryptographie_manifesto.json"
+VERSAO_MANIFESTO = 1
+
+
+class Manifesto:
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+        self.entradas = {}
+
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            if dados.get('versao') == VERSAO_MANIFESTO:
+                self.entradas = dados.get('arquivos', {})
+        except (FileNotFoundError, ValueError, AttributeError):
+            pass  # Manifesto ausente ou corrompido: processar tudo
+
+    def relativo(self, caminho):
+        return os.path.relpath(caminho, self.pasta)
+
+    def inalterado(self, caminho, assinatura, estado):
+        """Verificar, só pelo stat, se o arquivo continua no estado registrado"""
+        entrada = self.entradas.get(self.relativo(caminho))
+        return (entrada is not None and entrada['estado'] == estado
+                and (entrada['tamanho'], entrada['mtime_ns'], entrada['inode']) == tuple(assinatura))
+
+    def registrar(self, caminho, estado, assinatura):
+        """Registrar o estado do arquivo após o processamento"""
+        tamanho, mtime_ns, inode = assinatura
+        self.entradas[self.relativo(caminho)] = {
+            'tamanho': tamanho,
+            'mtime_ns': mtime_ns,
+            'inode': inode,
+            'estado': estado
+        }
+
+    def podar(self, caminhos_vistos, subpastas=True):
+        """Remover entradas de arquivos que não existem mais"""
+        vistos = {self.relativo(caminho) for caminho in caminhos_vistos}
+        for relativo in list(self.entradas):
+            # Sem subpastas, só as entradas do nível de cima foram verificadas
+            if relativo not in vistos and (subpastas or os.sep not in relativo):
+                del self.entradas[relativo]
+
+    def salvar(self):
+        """Gravar o manifesto de forma atômica"""
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({'versao': VERSAO_MANIFESTO, 'arquivos': self.entradas}, f, separators=(",", ":"))
+        os.replace(temporario, self.caminho)
+
+
+def coletar_arquivos(pasta, subpastas=True, incluir_backup=False):
+    """Listar (caminho, assinatura) dos arquivos da pasta usando apenas stat"""
+    encontrados = []
+    pendentes = [pasta]
+    while pendentes:
+        with os.scandir(pendentes.pop()) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    if subpastas:
+                        pendentes.append(entrada.path)
+                    continue
+                if not entrada.is_file():
+                    continue
+
+                nome = entrada.name
+                if nome.endswith(".bak") and not incluir_backup:
+                    continue
+                # Arquivos internos do aplicativo
+                if nome.startswith(ARQUIVO_MANIFESTO) or (nome.startswith(".crye_") and nome.endswith(".tmp")):
+                    continue
+
+                info = entrada.stat()
+                encontrados.append((entrada.path, (info.st_size, info.st_mtime_ns, entrada.inode())))
+    return encontrados
 
-try:
-    import winsound
 
-    winsound_disponivel = True
-except ImportError:
-    winsound_disponivel = False
+# Estado registrado no manifesto após cada operação
+ESTADOS_MANIFESTO = {'criptografar': 'criptografado', 'descriptografar': 'descriptografado'}
 
-try:
-    from scipy import signal
-    from scipy.io import wavfile
 
-    scipy_disponivel = True
-except ImportError:
-    scipy_disponivel = False
+def selecionar_arquivos_pasta(pasta, operacao, subpastas=True, incluir_backup=False, usar_manifesto=True):
+    """Retornar (encontrados, a processar, manifesto), pulando o que o manifesto indica como inalterado"""
+    arquivos_encontrados = coletar_arquivos(pasta, subpastas, incluir_backup)
+    if not usar_manifesto or not arquivos_encontrados:
+        return arquivos_encontrados, [caminho for caminho, _ in arquivos_encontrados], None
 
-try:
-    import serial
-    import serial.tools.list_ports
+    manifesto = Manifesto(pasta)
+    manifesto.podar([caminho for caminho, _ in arquivos_encontrados], subpastas)
+    estado = ESTADOS_MANIFESTO[operacao]
+    arquivos_para_processar = [caminho for caminho, assinatura in arquivos_encontrados
+                               if not manifesto.inalterado(caminho, assinatura, estado)]
+    return arquivos_encontrados, arquivos_para_processar, manifesto
 
-    serial_disponivel = True
-except ImportError:
-    serial_disponivel = False
+
+def registrar_resultado_manifesto(manifesto, resultado):
+    """Registrar no manifesto o estado final de um arquivo processado"""
+    if not manifesto or not resultado['assinatura'] or resultado['operacao'] not in ESTADOS_MANIFESTO:
+        return
+    # Ignorado com motivo (arquivo que só parecia criptografado): o estado não mudou
+    if resultado['operacao'] == 'descriptografar' and resultado['erro'] is not None:
+        return
+    manifesto.registrar(resultado['caminho'], ESTADOS_MANIFESTO[resultado['operacao']], resultado['assinatura'])
+
+
+# Motor paralelo para processamento de pastas
+def inicializar_worker(caminho_chave=ARQUIVO_CHAVE, caminho_chaveiro=ARQUIVO_CHAVEIRO, medir_fases=False,
+                       compressao=None):
+    """Carregar o chaveiro uma única vez em cada processo do pool"""
+    global _chaveiro_worker, _compressao_worker
+    _chaveiro_worker = carregar_chaveiro(caminho_chave, caminho_chaveiro)
+    _compressao_worker = compressao
+    cronometro.ativo = medir_fases
+
+
+def _inicializar_processo_pool(*argumentos):
+    # Ctrl+C fica com o processo principal, que espera as tarefas em andamento terminarem
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    inicializar_worker(*argumentos)
+
+
+def _assinatura_arquivo(caminho):
+    """Tamanho, mtime em nanossegundos e inode do arquivo"""
+    info = os.stat(caminho)
+    return info.st_size, info.st_mtime_ns, info.st_ino
+
+
+def processar_arquivo_pasta(tarefa, processos=1):
+    """Criptografar, descriptografar ou verificar um arquivo dentro de um processo do pool"""
+    caminho, operacao, backup = tarefa
+    resultado = {'caminho': caminho, 'operacao': operacao, 'status': 'ok', 'tamanho': 0, 'erro': None,
+                 'formato': None, 'assinatura': None, 'duplicata_de': None, 'segundos': 0.0}
+    inicio = time.perf_counter()
+
+    try:
+        # Verificar pelo cabeçalho se já está criptografado (só tokens Fernet são lidos inteiros)
+        formato = detectar_formato(caminho)
+        resultado['formato'] = formato
+        if formato in AVISOS_FORMATO:
+            resultado['erro'] = AVISOS_FORMATO[formato]
+            formato = None
+
+        if operacao == 'criptografar':
+            if formato is not None:
+                resultado['status'] = 'ignorado'
+                resultado['assinatura'] = _assinatura_arquivo(caminho)
+                return resultado
+
+            if backup:
+                # A criptografia grava em arquivo temporário e troca, então o hardlink é seguro
+                with cronometro.medir("backup"):
+                    criar_backup(caminho, permitir_hardlink=True)
+
+            resultado['tamanho'] = criptografar_arquivo_em_disco(caminho, _chaveiro_worker, processos,
+                                                                 _compressao_worker)
+        elif operacao == 'verificar':
+            if formato is None:
+                resultado['status'] = 'ignorado'
+                return resultado
+
+            try:
+                resultado['tamanho'] = verificar_arquivo_em_disco(caminho, _chaveiro_worker)
+            except (InvalidToken, InvalidTag, ValueError) as e:
+                resultado['status'] = 'erro'
+                resultado['erro'] = str(e) or "Falha na autenticação (arquivo corrompido ou chave incorreta)"
+            return resultado
+        else:
+            if formato is None:
+                resultado['status'] = 'ignorado'
+                resultado['assinatura'] = _assinatura_arquivo(caminho)
+                return resultado
+
+            resultado['tamanho'] = os.path.getsize(caminho)
+            try:
+                descriptografar_arquivo_em_disco(caminho, _chaveiro_worker, processos)
+            except (InvalidToken, InvalidTag, ValueError) as e:
+                # Está criptografado mas não abriu (chave errada ou ausente, arquivo corrompido):
+                # é um erro, não um arquivo ignorado, para o código de saída refletir a falha
+                resultado['status'] = 'erro'
+                resultado['erro'] = str(e) or "Falha na autenticação (arquivo corrompido ou chave incorreta)"
+                return resultado
+
+        # Estado final do arquivo, usado pelo manifesto da pasta
+        resultado['assinatura'] = _assinatura_arquivo(caminho)
+
+    except Exception as e:
+        resultado['status'] = 'erro'
+        resultado['erro'] = str(e)
+
+    finally:
+        resultado['segundos'] = time.perf_counter() - inicio
+        if cronometro.ativo:
+            resultado['fases'] = cronometro.drenar()
+
+    return resultado
+
+
+def processar_em_paralelo(tarefas, processos=None, caminho_chave=ARQUIVO_CHAVE, caminho_chaveiro=ARQUIVO_CHAVEIRO,
+                          compressao=None, cancelado=None):
+    """Distribuir as tarefas entre processos e devolver cada resultado assim que termina
+
+    Com `cancelado` (threading.Event) ligado, nenhuma tarefa nova é iniciada; as que já
+    estão em andamento terminam e os seus resultados ainda são devolvidos.
+    """
+    processos = processos or os.cpu_count() or 1
+    argumentos = (os.path.abspath(caminho_chave), os.path.abspath(caminho_chaveiro), cronometro.ativo,
+                  compressao)
+
+    if processos <= 1 or len(tarefas) <= 1:
+        # Um único arquivo ainda pode ter os segmentos divididos entre processos
+        inicializar_worker(*argumentos)
+        for tarefa in tarefas:
+            if cancelado is not None and cancelado.is_set():
+                return
+            resultado = processar_arquivo_pasta(tarefa, processos)
+            cronometro.mesclar(resultado.pop('fases', None))
+            yield resultado
+        return
+
+    # Lotes pequenos diluem o custo de comunicação em árvores com muitos arquivos pequenos
+    tamanho_lote = max(1, min(64, len(tarefas) // (processos * 8)))
+
+    # O pool consome a entrada inteira de uma vez; as vagas limitam o que já foi enviado,
+    # para que um cancelamento deixe de fora tudo o que ainda não começou
+    vagas = threading.Semaphore(processos * tamanho_lote * 2)
+    encerrado = threading.Event()
+
+    def parar():
+        return encerrado.is_set() or (cancelado is not None and cancelado.is_set())
+
+    def alimentar():
+        for tarefa in tarefas:
+            while not vagas.acquire(timeout=0.1):
+                if parar():
+                    return
+            if parar():
+                return
+            yield tarefa
+
+    pool = multiprocessing.Pool(processos, initializer=_inicializar_processo_pool, initargs=argumentos)
+    try:
+        for resultado in pool.imap_unordered(processar_arquivo_pasta, alimentar(), tamanho_lote):
+            vagas.release()
+            # Medições de fase feitas no processo do pool
+            cronometro.mesclar(resultado.pop('fases', None))
+            yield resultado
+    finally:
+        # Sem terminate(): um processo morto no meio deixaria arquivos pela metade e temporários
+        encerrado.set()
+        pool.close()
+        pool.join()
+
+
+# Deduplicação na criptografia de pastas: cada conteúdo é criptografado uma única vez
+TAMANHO_MINIMO_DEDUPLICACAO = 64 * 1024  # abaixo disso o hash custa quase o mesmo que criptografar
+
+
+def _hash_conteudo(caminho):
+    """BLAKE2b do conteúdo inteiro do arquivo"""
+    resumo = hashlib.blake2b(digest_size=32)
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_SEGMENTO_PADRAO), b""):
+            resumo.update(bloco)
+    return resumo.digest()
+
+
+def agrupar_duplicatas(caminhos, por_conteudo=False):
+    """Agrupar caminhos do mesmo inode (hardlinks) e, opcionalmente, de conteúdo idêntico
+
+    Retorna [(principal, [(duplicata, fonte, mesmo_inode, assinatura), ...])] na ordem
+    dos caminhos; cada duplicata recebe o resultado já criptografado da sua fonte.
+    """
+    grupos = {}
+    ordem = []
+    por_inode = {}
+    for caminho in caminhos:
+        try:
+            info = os.stat(caminho)
+        except OSError:
+            # O erro aparece normalmente ao processar o arquivo
+            grupos[caminho] = []
+            ordem.append(caminho)
+            continue
+
+        assinatura = (info.st_size, info.st_mtime_ns, info.st_ino)
+        principal = por_inode.setdefault((info.st_dev, info.st_ino), caminho)
+        if principal == caminho:
+            grupos[caminho] = []
+            ordem.append(caminho)
+        else:
+            grupos[principal].append((caminho, principal, True, assinatura))
+
+    if por_conteudo:
+        # Só arquivos do mesmo tamanho podem ser iguais; o hash é calculado apenas para eles
+        por_tamanho = {}
+        for caminho in ordem:
+            try:
+                tamanho = os.path.getsize(caminho)
+            except OSError:
+                continue
+            if tamanho >= TAMANHO_MINIMO_DEDUPLICACAO:
+                por_tamanho.setdefault(tamanho, []).append(caminho)
+
+        por_hash = {}
+        for candidatos in por_tamanho.values():
+            if len(candidatos) < 2:
+                continue
+            for caminho in candidatos:
+                try:
+                    if detectar_formato(caminho) is not None:
+                        continue
+                    assinatura = _assinatura_arquivo(caminho)
+                    chave = (assinatura[0], _hash_conteudo(caminho))
+                except OSError:
+                    continue
+
+                principal = por_hash.setdefault(chave, caminho)
+                if principal != caminho:
+                    # Os hardlinks da duplicata passam a apontar para a cópia criptografada dela
+                    grupos[principal].append((caminho, principal, False, assinatura))
+                    grupos[principal].extend(grupos.pop(caminho))
+
+        ordem = [caminho for caminho in ordem if caminho in grupos]
+
+    return [(principal, grupos[principal]) for principal in ordem]
+
+
+def replicar_criptografado(fonte, caminho, mesmo_inode, assinatura, backup=False):
+    """Substituir a duplicata pelo arquivo já criptografado da fonte; False se ela mudou desde o agrupamento"""
+    if mesmo_inode and os.path.samefile(fonte, caminho):
+        # A fonte foi regravada no próprio inode, então a duplicata já está criptografada;
+        # o backup dela vem do backup da fonte, feito antes da criptografia
+        if backup and os.path.exists(fonte + ".bak"):
+            with cronometro.medir("backup"):
+                criar_backup(caminho, permitir_hardlink=True, origem=fonte + ".bak")
+        return True
+
+    if _assinatura_arquivo(caminho) != assinatura:
+        return False
+
+    if backup:
+        with cronometro.medir("backup"):
+            criar_backup(caminho, permitir_hardlink=True)
+
+    if not mesmo_inode:
+        # Cópia do texto cifrado; substituir_arquivo cuida de hardlinks e metadados da duplicata
+        substituir_arquivo(caminho, lambda destino: _copiar_conteudo(fonte, destino.name))
+        return True
+
+    with cronometro.medir("escrita"):
+        fd, temporario = tempfile.mkstemp(prefix=".crye_", suffix=".tmp",
+                                          dir=os.path.dirname(os.path.abspath(caminho)))
+        os.close(fd)
+        try:
+            # Preserva a estrutura de hardlinks da árvore
+            os.remove(temporario)
+            os.link(fonte, temporario)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.lexists(temporario):
+                os.remove(temporario)
+    return True
+
+
+def processar_com_deduplicacao(tarefas, processos=None, caminho_chave=ARQUIVO_CHAVE,
+                               caminho_chaveiro=ARQUIVO_CHAVEIRO, por_conteudo=False, compressao=None,
+                               cancelado=None):
+    """Como processar_em_paralelo, mas processando cada inode (ou conteúdo) uma única vez
+
+    Hardlinks são agrupados ao criptografar e ao descriptografar, pois o arquivo é
+    regravado no próprio inode; o agrupamento por conteúdo vale só para criptografar.
+    """
+    if not tarefas or tarefas[0][1] not in ('criptografar', 'descriptografar'):
+        yield from processar_em_paralelo(tarefas, processos, caminho_chave, caminho_chaveiro, cancelado=cancelado)
+        return
+
+    operacao = tarefas[0][1]
+    backups = {caminho: backup for caminho, _, backup in tarefas}
+    grupos = agrupar_duplicatas(list(backups), por_conteudo and operacao == 'criptografar')
+    duplicatas = dict(grupos)
+    principais = [(principal, operacao, backups[principal]) for principal, _ in grupos]
+
+    # Duplicatas que não puderam ser replicadas são processadas de forma independente no final
+    pendentes = []
+    for resultado in processar_em_paralelo(principais, processos, caminho_chave, caminho_chaveiro, compressao,
+                                           cancelado):
+        yield resultado
+
+        concluidos = {resultado['caminho']} if resultado['status'] == 'ok' else set()
+        for caminho, fonte, mesmo_inode, assinatura in duplicatas[resultado['caminho']]:
+            try:
+                replicado = fonte in concluidos and replicar_criptografado(
+                    fonte, caminho, mesmo_inode, assinatura, backups[caminho])
+            except OSError:
+                replicado = False
+            if not replicado:
+                pendentes.append((caminho, operacao, backups[caminho]))
+                continue
+
+            concluidos.add(caminho)
+            yield {'caminho': caminho, 'operacao': operacao, 'status': 'ok',
+                   'tamanho': resultado['tamanho'], 'erro': None, 'formato': None,
+                   'assinatura': _assinatura_arquivo(caminho), 'duplicata_de': fonte, 'segundos': 0.0}
+
+    if pendentes:
+        yield from processar_em_paralelo(pendentes, processos, caminho_chave, caminho_chaveiro, compressao,
+                                         cancelado)
+
+
+# Derivação de chaves a partir de senha
+ITERACOES_PBKDF2 = 100000
+
+# Envelope compacto de textos (versão 3): versão, flags, salt e nonce em binário,
+# seguidos do texto cifrado com AES-256-GCM; o cabeçalho é o dado associado
+VERSAO_ENVELOPE_TEXTO = 3
+ENVELOPE_TEXTO = struct.Struct(">BB16s12s")
+FLAG_TEXTO_SENHA_PERSONALIZADA = 0x01
+# Modo sessão: salt da sessão (PBKDF2, uma vez por senha) + salt da mensagem (HKDF)
+FLAG_TEXTO_SESSAO = 0x02
+ENVELOPE_TEXTO_SESSAO = struct.Struct(">BB16s16s12s")
+INFO_HKDF_TEXTO_SESSAO = b"CryptographiE texto sessao v3"
+FLAGS_ENVELOPE_TEXTO = FLAG_TEXTO_SENHA_PERSONALIZADA | FLAG_TEXTO_SESSAO
+# Prefixos fora do alfabeto base64, impossíveis nos formatos anteriores
+PREFIXOS_ENVELOPE_TEXTO = {'base64': "3.", 'base85': "3:"}
+
+
+def codificar_envelope_texto(binario, codificacao='base64'):
+    """Codificar o envelope binário em texto: base64 URL sem preenchimento ou base85"""
+    if codificacao not in PREFIXOS_ENVELOPE_TEXTO:
+        raise ValueError(f"Codificação desconhecida: {codificacao}")
+    if codificacao == 'base85':
+        corpo = base64.b85encode(binario)
+    else:
+        corpo = base64.urlsafe_b64encode(binario).rstrip(b"=")
+    return PREFIXOS_ENVELOPE_TEXTO[codificacao] + corpo.decode('ascii')
+
+
+def decodificar_envelope_texto(texto):
+    """Recuperar o envelope binário; None se o texto não estiver na versão 3"""
+    prefixo, corpo = texto[:2], texto[2:]
+    if prefixo == PREFIXOS_ENVELOPE_TEXTO['base85']:
+        return base64.b85decode(corpo)
+    if prefixo == PREFIXOS_ENVELOPE_TEXTO['base64']:
+        return base64.urlsafe_b64decode(corpo + "=" * (-len(corpo) % 4))
+    return None
+
+
+# Cache LRU para chaves derivadas com PBKDF2
+class CacheChaves:
+    def __init__(self, capacidade=128, validade=600):
+        self.capacidade = capacidade
+        self.validade = validade  # segundos
+        self.entradas = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.trava = threading.Lock()
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def obter(self, chave_cache):
+        """Retornar a chave em cache, ou None se ausente ou expirada"""
+        with self.trava:
+            entrada = self.entradas.get(chave_cache)
+            if entrada is not None:
+                chave, criada_em = entrada
+                if time.monotonic() - criada_em <= self.validade:
+                    self.entradas.move_to_end(chave_cache)
+                    self.acertos += 1
+                    return chave
+                del self.entradas[chave_cache]
+
+            self.falhas += 1
+            return None
+
+    def guardar(self, chave_cache, chave):
+        """Guardar uma chave derivada, descartando as menos usadas"""
+        with self.trava:
+            self.entradas[chave_cache] = (chave, time.monotonic())
+            self.entradas.move_to_end(chave_cache)
+            while len(self.entradas) > self.capacidade:
+                self.entradas.popitem(last=False)
+
+    def limpar(self):
+        """Descartar todas as chaves em cache"""
+        with self.trava:
+            self.entradas.clear()
+
+
+# Executor de operações longas fora da thread da interface
+class ExecutorTarefas:
+    def __init__(self):
+        self.fila = queue.Queue()
+        self.thread = None
+        self.cancelado = threading.Event()
+
+    @property
+    def ocupado(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def iniciar(self, funcao, *args):
+        """Executar funcao(executor, *args) em uma thread de fundo"""
+        self.cancelado.clear()
+        self.thread = threading.Thread(target=self._executar, args=(funcao,) + args, daemon=True)
+        self.thread.start()
+
+    def _executar(self, funcao, *args):
+        try:
+            funcao(self, *args)
+        except Exception as e:
+            self.enviar('falha', str(e))
+        finally:
+            self.enviar('fim')
+
+    def enviar(self, tipo, *dados):
+        """Enviar uma mensagem para a interface (seguro entre threads)"""
+        self.fila.put((tipo, dados))
+
+    def cancelar(self):
+        self.cancelado.set()
+
+    def drenar(self, limite=5000):
+        """Retornar as mensagens pendentes sem bloquear"""
+        mensagens = []
+        try:
+            while len(mensagens) < limite:
+                mensagens.append(self.fila.get_nowait())
+        except queue.Empty:
+            pass
+        return mensagens
+
+
+# Taxa de atualização da janela de progresso (10 Hz)
+INTERVALO_PROGRESSO = 0.1
+
+# Histórico: entradas mantidas em memória e linhas exibidas na tela
+CAPACIDADE_HISTORICO = 1000
+LINHAS_HISTORICO_TELA = 200
+
+# Tipos de entrada exibidos por cada filtro do histórico
+FILTROS_HISTORICO = {
+    "Criptografia": "PROCESSAMENTO",
+    "Descriptografia": "RESTAURACAO",
+    "Sistema": "SISTEMA",
+    "Erros": "ERRO"
+}
+
+
+# Classe para medir vazão e estimar o tempo restante
+class MedidorProgresso:
+    def __init__(self, janela=5.0):
+        self.janela = janela  # segundos considerados na média móvel
+        self.amostras = deque()
+
+    def registrar(self, arquivos, tamanho):
+        """Registrar o total acumulado de arquivos e bytes processados"""
+        agora = time.monotonic()
+        self.amostras.append((agora, arquivos, tamanho))
+        while len(self.amostras) > 2 and agora - self.amostras[0][0] > self.janela:
+            self.amostras.popleft()
+
+    def taxas(self):
+        """Retornar (bytes/s, arquivos/s) na janela recente, ou None sem dados suficientes"""
+        if len(self.amostras) < 2:
+            return None
+        (t0, a0, b0), (t1, a1, b1) = self.amostras[0], self.amostras[-1]
+        if t1 - t0 <= 0:
+            return None
+        return (b1 - b0) / (t1 - t0), (a1 - a0) / (t1 - t0)
+
+    def tempo_restante(self, restantes):
+        """Estimar os segundos restantes a partir da vazão em arquivos/s"""
+        taxas = self.taxas()
+        if not taxas or taxas[1] <= 0:
+            return None
+        return restantes / taxas[1]
+
+
+# Registro persistente de operações (somente anexação) com índices
+PASTA_HISTORICO = "historico"
+REGISTRO_INDICE = struct.Struct(">dQ")  # instante (epoch) e posição da linha no log
+
+
+class RegistroOperacoes:
+    def __init__(self, pasta=PASTA_HISTORICO):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+        self.caminho_log = os.path.join(pasta, "operacoes.log")
+        self.arquivo_log = open(self.caminho_log, "ab")
+        self.indices = {}  # tipo (None = todos) -> arquivo de índice aberto para anexação
+        self.trava = threading.Lock()
+        self._recuperar_indice()
+
+    def _caminho_indice(self, tipo):
+        return os.path.join(self.pasta, f"indice_{tipo or 'TODOS'}.idx")
+
+    def _indice(self, tipo):
+        if tipo not in self.indices:
+            self.indices[tipo] = open(self._caminho_indice(tipo), "ab")
+        return self.indices[tipo]
+
+    def _truncar_indice(self, caminho):
+        """Descartar um registro incompleto no fim do índice e retornar o tamanho restante"""
+        tamanho = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        if tamanho % REGISTRO_INDICE.size:
+            with open(caminho, "r+b") as f:
+                f.truncate(tamanho - tamanho % REGISTRO_INDICE.size)
+            tamanho -= tamanho % REGISTRO_INDICE.size
+        return tamanho
+
+    def _caminhos_indices_tipo(self):
+        geral = os.path.basename(self._caminho_indice(None))
+        return [os.path.join(self.pasta, nome) for nome in os.listdir(self.pasta)
+                if nome.startswith("indice_") and nome.endswith(".idx") and nome != geral]
+
+    def _recuperar_indice(self):
+        """Reparar os índices após uma queda no meio da gravação
+
+        O índice geral recebe as linhas do log que ficaram de fora; os índices por tipo
+        são reconstruídos a partir dele quando a soma dos seus registros não bate.
+        """
+        self._recuperar_indice_geral()
+
+        total = self.contar()
+        por_tipo = sum(self._truncar_indice(caminho) for caminho in self._caminhos_indices_tipo())
+        if por_tipo != total * REGISTRO_INDICE.size:
+            self._reconstruir_indices_tipo()
+            self.registrar("SISTEMA", f"Índices por tipo do histórico reconstruídos "
+                                      f"({por_tipo // REGISTRO_INDICE.size} de {total} entradas)")
+
+    def _reconstruir_indices_tipo(self):
+        """Regravar os índices por tipo a partir do índice geral e do log"""
+        for caminho in self._caminhos_indices_tipo():
+            os.remove(caminho)
+
+        with open(self._caminho_indice(None), "rb") as indice, open(self.caminho_log, "rb") as log:
+            while True:
+                registro = indice.read(REGISTRO_INDICE.size)
+                if len(registro) < REGISTRO_INDICE.size:
+                    break
+                log.seek(REGISTRO_INDICE.unpack(registro)[1])
+                self._indice(json.loads(log.readline())["tipo"]).write(registro)
+        self.descarregar()
+
+    def _recuperar_indice_geral(self):
+        """Indexar no índice geral as linhas gravadas no log mas ausentes dele"""
+        caminho = self._caminho_indice(None)
+        tamanho = self._truncar_indice(caminho)
+
+        inicio = 0
+        if tamanho:
+            with open(caminho, "rb") as f:
+                f.seek(tamanho - REGISTRO_INDICE.size)
+                _, posicao = REGISTRO_INDICE.unpack(f.read(REGISTRO_INDICE.size))
+            with open(self.caminho_log, "rb") as f:
+                f.seek(posicao)
+                inicio = posicao + len(f.readline())
+
+        if inicio >= os.path.getsize(self.caminho_log):
+            return
+
+        with open(self.caminho_log, "rb") as f:
+            f.seek(inicio)
+            posicao = inicio
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    break  # Linha incompleta: ignorada
+                try:
+                    dados = json.loads(linha)
+                    # Só o índice geral: os por tipo são conferidos depois, pela contagem
+                    self._indice(None).write(REGISTRO_INDICE.pack(dados["t"], posicao))
+                except (ValueError, KeyError):
+                    pass
+                posicao += len(linha)
+        self.descarregar()
+
+    def _indexar(self, instante, tipo, posicao):
+        registro = REGISTRO_INDICE.pack(instante, posicao)
+        self._indice(None).write(registro)
+        self._indice(tipo).write(registro)
+
+    def registrar(self, tipo, operacao, instante=None):
+        """Anexar uma operação ao log (gravada em disco em descarregar())"""
+        instante = time.time() if instante is None else instante
+        linha = json.dumps({"t": instante, "tipo": tipo, "op": operacao}, ensure_ascii=False) + "\n"
+        with self.trava:
+            posicao = self.arquivo_log.tell()
+            self.arquivo_log.write(linha.encode("utf-8"))
+            self._indexar(instante, tipo, posicao)
+
+    def descarregar(self):
+        """Gravar em disco as entradas pendentes (log antes dos índices)"""
+        with self.trava:
+            self.arquivo_log.flush()
+            for arquivo in self.indices.values():
+                arquivo.flush()
+
+    def contar(self, tipo=None):
+        caminho = self._caminho_indice(tipo)
+        return os.path.getsize(caminho) // REGISTRO_INDICE.size if os.path.exists(caminho) else 0
+
+    def _buscar(self, f, total, instante):
+        """Busca binária: primeiro registro do índice com instante >= instante"""
+        baixo, alto = 0, total
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            f.seek(meio * REGISTRO_INDICE.size)
+            if REGISTRO_INDICE.unpack(f.read(REGISTRO_INDICE.size))[0] < instante:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def consultar(self, tipo=None, inicio=None, fim=None, limite=None):
+        """Entradas de um tipo e intervalo de tempo, em ordem; limite = apenas as últimas N"""
+        self.descarregar()
+        total = self.contar(tipo)
+        if not total:
+            return
+
+        with open(self._caminho_indice(tipo), "rb") as indice, open(self.caminho_log, "rb") as log:
+            primeiro = self._buscar(indice, total, inicio) if inicio is not None else 0
+            ultimo = self._buscar(indice, total, fim) if fim is not None else total
+            if limite is not None:
+                primeiro = max(primeiro, ultimo - limite)
+
+            indice.seek(primeiro * REGISTRO_INDICE.size)
+            for _ in range(primeiro, ultimo):
+                _, posicao = REGISTRO_INDICE.unpack(indice.read(REGISTRO_INDICE.size))
+                log.seek(posicao)
+                dados = json.loads(log.readline())
+                yield {
+                    'timestamp': datetime.datetime.fromtimestamp(dados["t"]).strftime("%d/%m/%Y %H:%M:%S"),
+                    'operacao': dados["op"],
+                    'tipo': dados["tipo"]
+                }
+
+    def limpar(self):
+        """Apagar o log e todos os índices"""
+        with self.trava:
+            for arquivo in self.indices.values():
+                arquivo.close()
+            self.indices.clear()
+            self.arquivo_log.close()
+
+            for nome in os.listdir(self.pasta):
+                if nome.startswith("indice_") and nome.endswith(".idx"):
+                    os.remove(os.path.join(self.pasta, nome))
+            self.arquivo_log = open(self.caminho_log, "wb")
+
+
+# Banco de estatísticas persistentes (totais diários e por extensão)
+ARQUIVO_ESTATISTICAS = "estatisticas.db"
+LOTE_ESTATISTICAS = 500  # operações acumuladas antes de gravar
+INTERVALO_ESTATISTICAS = 2.0  # segundos máximos sem gravar
+INTERVALO_REDESENHO_ESTATISTICAS = 1.0  # segundos mínimos entre redesenhos da aba
 
 
 # Classe para estatísticas de uso
 class Estatisticas:
-    def __init__(self):
+    COLUNAS = {'criptografar': 'cripto', 'descriptografar': 'descripto'}
+
+    def __init__(self, caminho=ARQUIVO_ESTATISTICAS):
+        try:
+            self.conexao = sqlite3.connect(caminho)
+            self.conexao.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            self.conexao = sqlite3.connect(":memory:")  # Sem disco: estatísticas só da sessão
+
+        with self.conexao:
+            self.conexao.executescript("""
+                CREATE TABLE IF NOT EXISTS por_dia (
+                    dia TEXT, tipo TEXT, arquivos INTEGER, bytes INTEGER, PRIMARY KEY (dia, tipo));
+                CREATE TABLE IF NOT EXISTS por_extensao (
+                    extensao TEXT, tipo TEXT, arquivos INTEGER, bytes INTEGER, PRIMARY KEY (extensao, tipo));
+            """)
+
+        self.hora_inicio = datetime.datetime.now()
+        self.versao = 0  # Incrementada a cada alteração, para a interface saber quando redesenhar
+        self.pendentes_dia = {}
+        self.pendentes_extensao = {}
+        self.total_pendentes = 0
+        self.ultima_gravacao = time.monotonic()
+        self.carregar()
+
+    def carregar(self):
+        """Montar os contadores a partir dos totais já agregados no banco"""
         self.arquivos_criptografados = 0
         self.arquivos_descriptografados = 0
         self.tamanho_total_criptografado = 0
         self.tamanho_total_descriptografado = 0
         self.operacoes_por_dia = {}
         self.tipos_arquivos = {}
-        self.hora_inicio = datetime.datetime.now()
+
+        for dia, tipo, arquivos, tamanho in self.conexao.execute("SELECT dia, tipo, arquivos, bytes FROM por_dia"):
+            self.operacoes_por_dia.setdefault(dia, {'cripto': 0, 'descripto': 0})[self.COLUNAS[tipo]] += arquivos
+            if tipo == 'criptografar':
+                self.arquivos_criptografados += arquivos
+                self.tamanho_total_criptografado += tamanho
+            else:
+                self.arquivos_descriptografados += arquivos
+                self.tamanho_total_descriptografado += tamanho
+
+        for extensao, tipo, arquivos in self.conexao.execute("SELECT extensao, tipo, arquivos FROM por_extensao"):
+            self.tipos_arquivos.setdefault(extensao, {'cripto': 0, 'descripto': 0})[self.COLUNAS[tipo]] += arquivos
 
     def registrar_operacao(self, tipo, tamanho=0, extensao=None):
         if tipo == 'criptografar':
@@ -66,92 +1756,84 @@ class Estatisticas:
         elif tipo == 'descriptografar':
             self.arquivos_descriptografados += 1
             self.tamanho_total_descriptografado += tamanho
+        else:
+            return
+        self.versao += 1
 
         # Registra operação por data
         data_hoje = datetime.datetime.now().strftime('%Y-%m-%d')
         if data_hoje not in self.operacoes_por_dia:
             self.operacoes_por_dia[data_hoje] = {'cripto': 0, 'descripto': 0}
-
-        if tipo == 'criptografar':
-            self.operacoes_por_dia[data_hoje]['cripto'] += 1
-        elif tipo == 'descriptografar':
-            self.operacoes_por_dia[data_hoje]['descripto'] += 1
+        self.operacoes_por_dia[data_hoje][self.COLUNAS[tipo]] += 1
+        self._acumular(self.pendentes_dia, (data_hoje, tipo), tamanho)
 
         # Registra operação por tipo de arquivo
         if extensao:
             if extensao not in self.tipos_arquivos:
                 self.tipos_arquivos[extensao] = {'cripto': 0, 'descripto': 0}
+            self.tipos_arquivos[extensao][self.COLUNAS[tipo]] += 1
+            self._acumular(self.pendentes_extensao, (extensao, tipo), tamanho)
+
+        # Gravação em lote: por quantidade ou por tempo
+        self.total_pendentes += 1
+        if (self.total_pendentes >= LOTE_ESTATISTICAS
+                or time.monotonic() - self.ultima_gravacao >= INTERVALO_ESTATISTICAS):
+            self.salvar()
+
+    def _acumular(self, pendentes, chave, tamanho):
+        arquivos, total = pendentes.get(chave, (0, 0))
+        pendentes[chave] = (arquivos + 1, total + tamanho)
+
+    def salvar(self):
+        """Gravar as operações pendentes em uma única transação"""
+        self.ultima_gravacao = time.monotonic()
+        if not self.total_pendentes:
+            return
 
-            if tipo == 'criptografar':
-                self.tipos_arquivos[extensao]['cripto'] += 1
-            elif tipo == 'descriptografar':
-                self.tipos_arquivos[extensao]['descripto'] += 1
+        with self.conexao:
+            self.conexao.executemany(
+                "INSERT INTO por_dia VALUES (?, ?, ?, ?) ON CONFLICT (dia, tipo) DO UPDATE SET "
+                "arquivos = arquivos + excluded.arquivos, bytes = bytes + excluded.bytes",
+                [(dia, tipo, arquivos, tamanho) for (dia, tipo), (arquivos, tamanho) in self.pendentes_dia.items()])
+            self.conexao.executemany(
+                "INSERT INTO por_extensao VALUES (?, ?, ?, ?) ON CONFLICT (extensao, tipo) DO UPDATE SET "
+                "arquivos = arquivos + excluded.arquivos, bytes = bytes + excluded.bytes",
+                [(extensao, tipo, arquivos, tamanho)
+                 for (extensao, tipo), (arquivos, tamanho) in self.pendentes_extensao.items()])
+
+        self.pendentes_dia.clear()
+        self.pendentes_extensao.clear()
+        self.total_pendentes = 0
+
+    def limpar(self):
+        """Apagar todos os dados estatísticos, inclusive os gravados"""
+        self.pendentes_dia.clear()
+        self.pendentes_extensao.clear()
+        self.total_pendentes = 0
+        with self.conexao:
+            self.conexao.execute("DELETE FROM por_dia")
+            self.conexao.execute("DELETE FROM por_extensao")
+        self.hora_inicio = datetime.datetime.now()
+        self.versao += 1
+        self.carregar()
 
 
-class MenuLateralApp:
-    def __init__(self, root):
-        self.janela = root
-        self.janela.title("CryptographiE")
-        self.janela.minsize(800, 600)
-
-        # Adicionar ícone personalizado
-        try:
-            self.janela.iconbitmap("crypto.ico")  # Coloque o arquivo icone.ico na mesma pasta
-        except:
-            pass  # Se não encontrar o arquivo, continua sem ícone
+# Classe para criptografia de textos (usada pela interface e pela linha de comando)
+class CifradorTexto:
+    def __init__(self):
+        # Cache das chaves derivadas de senha (PBKDF2)
+        self.cache_chaves = CacheChaves()
 
-        # Instância de estatísticas
-        self.estatisticas = Estatisticas()
+        # Pool de threads para testar senhas candidatas em paralelo
+        self.executor_senhas = None
 
-        # Lista para armazenar o histórico de operações com arquivos
-        self.historico_arquivos = []
+        # Salt da sessão por senha (digest), usado no modo sessão
+        self.salts_sessao = {}
+        self.trava_sessao = threading.Lock()
 
         # Chave mestra fixa para criptografia automática
         self.chave_mestra = self.gerar_chave_mestra()
 
-        # Dicionário para armazenar metadados dos arquivos processados
-        self.metadados_arquivos = {}
-
-        # Variáveis para código Morse
-        self.reproduzindo = False
-        self.thread_reproducao = None
-        self.pausado = False  # Estado de pausa
-        self.evento_pausa = threading.Event()  # Evento para controlar pausa
-        self.evento_pausa.set()  # Iniciar desbloqueado
-
-        # Variáveis para Arduino
-        self.arduino_serial = None
-        self.arduino_conectado = False
-        self.arduino_porta = None
-        self.thread_arduino = None
-        self.transmitindo_arduino = False
-
-        # Variáveis para controle de login
-        self.usuario_logado = False
-        self.email_usuario_logado = ""
-
-        # Configurar comportamento responsivo
-        self.janela.columnconfigure(1, weight=1)
-        self.janela.rowconfigure(0, weight=1)
-
-        # Criar o menu lateral
-        self.criar_menu_lateral()
-
-        # Criar área principal
-        self.criar_area_principal()
-
-        # Criar menu
-        self.criar_menu()
-
-        # Criar barra de status
-        self.criar_barra_status()
-
-        # Mostrar primeira aba por padrão
-        self.mostrar_aba("texto")
-
-        # Inicializar estatísticas
-        self.atualizar_estatisticas()
-
     def gerar_chave_mestra(self):
         """Gerar chave mestra fixa baseada no sistema"""
         sistema_info = f"{os.environ.get('USERNAME', 'user')}{os.environ.get('COMPUTERNAME', 'pc')}"
@@ -170,60 +1852,128 @@ class MenuLateralApp:
 
         chave_combinada = self.chave_mestra + senha_bytes
 
-        kdf = PBKDF2HMAC(
+        # A senha entra no cache apenas como digest
+        chave_cache = (hashlib.sha256(chave_combinada).digest(), bytes(salt), ITERACOES_PBKDF2)
+        key = self.cache_chaves.obter(chave_cache)
+        if key is not None:
+            return key, salt
+
+        # hashlib libera o GIL durante o PBKDF2, permitindo derivações concorrentes
+        key = base64.urlsafe_b64encode(
+            hashlib.pbkdf2_hmac('sha256', chave_combinada, salt, ITERACOES_PBKDF2, dklen=32)
+        )
+        self.cache_chaves.guardar(chave_cache, key)
+        return key, salt
+
+    def salt_sessao(self, senha):
+        """Salt da sessão para a senha, sorteado no primeiro uso"""
+        digest = hashlib.sha256(self.chave_mestra + senha.encode('utf-8')).digest()
+        with self.trava_sessao:
+            return self.salts_sessao.setdefault(digest, os.urandom(16))
+
+    def encerrar_sessao_texto(self):
+        """Descartar os salts da sessão; as próximas mensagens começam uma sessão nova"""
+        with self.trava_sessao:
+            self.salts_sessao.clear()
+
+    def chave_mensagem_sessao(self, senha, salt_sessao, salt_mensagem):
+        """Derivar com HKDF a chave de uma mensagem a partir da chave da sessão (PBKDF2 em cache)"""
+        key, _ = self.gerar_chave_de_senha(senha, salt_sessao)
+        hkdf = HKDF(
             algorithm=hashes.SHA256(),
             length=32,
-            salt=salt,
-            iterations=100000,
+            salt=salt_mensagem,
+            info=INFO_HKDF_TEXTO_SESSAO,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(chave_combinada))
-        return key, salt
+        return hkdf.derive(base64.urlsafe_b64decode(key))
 
-    def criptografar_texto(self, texto, senha_personalizada=None):
-        """Criptografar texto - VERSÃO CORRIGIDA"""
+    def criptografar_texto(self, texto, senha_personalizada=None, codificacao='base64', sessao=False):
+        """Criptografar texto no envelope compacto (versão 3)
+
+        No modo sessão o PBKDF2 roda uma vez por senha e cada mensagem usa uma chave HKDF.
+        """
         try:
-            # Gerar salt único para esta operação
+            # Salt e nonce únicos para esta operação
             salt = os.urandom(16)
+            nonce = os.urandom(12)
 
-            if senha_personalizada:
-                # Usar senha personalizada
-                senha_para_chave = senha_personalizada
-                usar_senha_personalizada = True
+            # Sem senha personalizada, usar a senha padrão
+            senha_para_chave = senha_personalizada or "texto_default_2024"
+            flags = FLAG_TEXTO_SENHA_PERSONALIZADA if senha_personalizada else 0
+
+            if sessao:
+                flags |= FLAG_TEXTO_SESSAO
+                salt_sessao = self.salt_sessao(senha_para_chave)
+                chave = self.chave_mensagem_sessao(senha_para_chave, salt_sessao, salt)
+                cabecalho = ENVELOPE_TEXTO_SESSAO.pack(VERSAO_ENVELOPE_TEXTO, flags, salt_sessao, salt, nonce)
             else:
-                # Usar senha padrão
-                senha_para_chave = "texto_default_2024"
-                usar_senha_personalizada = False
+                key, _ = self.gerar_chave_de_senha(senha_para_chave, salt)
+                chave = base64.urlsafe_b64decode(key)
+                cabecalho = ENVELOPE_TEXTO.pack(VERSAO_ENVELOPE_TEXTO, flags, salt, nonce)
 
-            # Gerar chave
-            key, _ = self.gerar_chave_de_senha(senha_para_chave, salt)
-            f = Fernet(key)
+            # A autenticação do GCM substitui o hash do texto usado na versão 2.2
+            cifrado = AESGCM(chave).encrypt(nonce, texto.encode('utf-8'), cabecalho)
 
-            # Criptografar texto
-            texto_criptografado = f.encrypt(texto.encode('utf-8'))
+            return codificar_envelope_texto(cabecalho + cifrado, codificacao)
+        except Exception as e:
+            raise Exception(f"Erro na criptografia: {str(e)}")
 
-            # Criar estrutura de dados
-            dados_completos = {
-                'salt': base64.urlsafe_b64encode(salt).decode(),
-                'senha_personalizada': usar_senha_personalizada,
-                'dados': base64.urlsafe_b64encode(texto_criptografado).decode(),
-                'versao': '2.2'  # Nova versão corrigida
-            }
+    def descriptografar_envelope(self, binario, senha_personalizada=None):
+        """Descriptografar um envelope binário da versão 3"""
+        if len(binario) < 2:
+            raise Exception("Envelope de texto incompleto")
 
-            # Se não é senha personalizada, armazenar hash do texto para validação
-            if not usar_senha_personalizada:
-                hash_texto = hashlib.sha256(texto.encode()).hexdigest()
-                dados_completos['hash_texto'] = hash_texto
+        versao, flags = binario[0], binario[1]
+        if versao != VERSAO_ENVELOPE_TEXTO or flags & ~FLAGS_ENVELOPE_TEXTO:
+            raise Exception(f"Versão de envelope não suportada: {versao} (flags {flags:#04x})")
 
-            json_dados = json.dumps(dados_completos)
-            resultado = base64.urlsafe_b64encode(json_dados.encode()).decode()
+        formato = ENVELOPE_TEXTO_SESSAO if flags & FLAG_TEXTO_SESSAO else ENVELOPE_TEXTO
+        if len(binario) < formato.size + TAMANHO_TAG:
+            raise Exception("Envelope de texto incompleto")
 
-            return resultado
-        except Exception as e:
-            raise Exception(f"Erro na criptografia: {str(e)}")
+        if flags & FLAG_TEXTO_SENHA_PERSONALIZADA:
+            if not senha_personalizada:
+                raise Exception("Este texto foi criptografado com senha personalizada. Por favor, forneça a senha.")
+            senha_para_chave = senha_personalizada
+        else:
+            senha_para_chave = "texto_default_2024"
+
+        if flags & FLAG_TEXTO_SESSAO:
+            _, _, salt_sessao, salt, nonce = formato.unpack_from(binario)
+            chave = self.chave_mensagem_sessao(senha_para_chave, salt_sessao, salt)
+        else:
+            _, _, salt, nonce = formato.unpack_from(binario)
+            key, _ = self.gerar_chave_de_senha(senha_para_chave, salt)
+            chave = base64.urlsafe_b64decode(key)
+
+        try:
+            texto = AESGCM(chave).decrypt(nonce, binario[formato.size:], binario[:formato.size])
+        except InvalidTag:
+            raise Exception("Senha incorreta ou texto corrompido")
+        return texto.decode('utf-8')
+
+    def criptografar_textos(self, textos, senha_personalizada=None, codificacao='base64'):
+        """Criptografar vários textos no modo sessão (uma única derivação PBKDF2 por senha)"""
+        return [self.criptografar_texto(texto, senha_personalizada, codificacao, sessao=True) for texto in textos]
+
+    def descriptografar_textos(self, textos, senha_personalizada=None):
+        """Descriptografar vários textos; retorna (texto, erro) para cada entrada"""
+        resultados = []
+        for texto_criptografado in textos:
+            try:
+                resultados.append((self.descriptografar_texto(texto_criptografado, senha_personalizada), None))
+            except Exception as e:
+                resultados.append((None, str(e)))
+        return resultados
 
     def descriptografar_texto(self, texto_criptografado, senha_personalizada=None):
-        """Descriptografar texto - VERSÃO CORRIGIDA"""
+        """Descriptografar texto - envelope compacto (3) ou formatos 2.2 e anteriores"""
         try:
+            texto_criptografado = texto_criptografado.strip()
+            binario = decodificar_envelope_texto(texto_criptografado)
+            if binario is not None:
+                return self.descriptografar_envelope(binario, senha_personalizada)
+
             # Decodificar dados
             json_dados = base64.urlsafe_b64decode(texto_criptografado.encode()).decode()
             dados_completos = json.loads(json_dados)
@@ -233,72 +1983,265 @@ class MenuLateralApp:
             senha_personalizada_flag = dados_completos.get('senha_personalizada', False)
             versao = dados_completos.get('versao', '1.0')
 
-            if senha_personalizada_flag:
-                # Foi criptografado com senha personalizada
-                if not senha_personalizada:
-                    raise Exception("Este texto foi criptografado com senha personalizada. Por favor, forneça a senha.")
+            if senha_personalizada_flag:
+                # Foi criptografado com senha personalizada
+                if not senha_personalizada:
+                    raise Exception("Este texto foi criptografado com senha personalizada. Por favor, forneça a senha.")
+
+                senha_para_chave = senha_personalizada
+            else:
+                # Foi criptografado com senha padrão
+                if versao >= '2.2':
+                    senha_para_chave = "texto_default_2024"
+                else:
+                    # Compatibilidade com versões antigas
+                    senha_para_chave = "default_key"
+
+            # Gerar chave e descriptografar
+            key, _ = self.gerar_chave_de_senha(senha_para_chave, salt)
+            f = Fernet(key)
+            texto_descriptografado = f.decrypt(dados_criptografados).decode('utf-8')
+
+            # Se não é senha personalizada e temos hash, validar
+            if not senha_personalizada_flag and 'hash_texto' in dados_completos:
+                hash_esperado = dados_completos['hash_texto']
+                hash_atual = hashlib.sha256(texto_descriptografado.encode()).hexdigest()
+
+                if hash_esperado != hash_atual:
+                    raise Exception("Falha na validação da integridade do texto")
+
+            return texto_descriptografado
+
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # Tentar formatos antigos (salt + token sem JSON)
+            return self.descriptografar_texto_formato_antigo(texto_criptografado, senha_personalizada)
+        except Exception as e:
+            raise Exception(f"Erro na descriptografia: {str(e)}")
+
+    # Senhas testadas no formato antigo (compatibilidade); pode ser estendida
+    SENHAS_LEGADAS = [
+        "texto_default_2024",  # Nova senha padrão
+        "default_key",  # Senha antiga
+        "",  # Senha vazia
+        "text_key"  # Outra variação
+    ]
+
+    def testar_senhas_candidatas(self, salt, texto_cripto, senhas):
+        """Derivar as senhas candidatas em paralelo; a primeira que descriptografar vence"""
+        if self.executor_senhas is None:
+            self.executor_senhas = ThreadPoolExecutor(max_workers=max(4, os.cpu_count() or 1),
+                                                      thread_name_prefix="senhas")
+
+        encontrado = threading.Event()
+
+        def tentar(senha):
+            if encontrado.is_set():
+                return None
+            key, _ = self.gerar_chave_de_senha(senha, salt)
+            if encontrado.is_set():
+                return None
+            try:
+                return senha, Fernet(key).decrypt(texto_cripto).decode('utf-8')
+            except (InvalidToken, UnicodeDecodeError):
+                return None
+
+        futuros = [self.executor_senhas.submit(tentar, senha) for senha in senhas]
+        try:
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                if resultado is not None:
+                    encontrado.set()
+                    return resultado
+        finally:
+            # Cancelar as derivações que ainda não começaram
+            for futuro in futuros:
+                futuro.cancel()
+
+        return None
+
+    def descriptografar_texto_formato_antigo(self, texto_criptografado, senha_personalizada=None,
+                                             senhas_extras=None):
+        """Descriptografar texto no formato antigo (compatibilidade)"""
+        try:
+            dados = base64.urlsafe_b64decode(texto_criptografado.encode())
+            salt = dados[:16]
+            texto_cripto = dados[16:]
+
+            # Lista de senhas para testar (compatibilidade)
+            senhas_teste = list(self.SENHAS_LEGADAS) + list(senhas_extras or [])
+
+            # Se senha personalizada fornecida, tentar primeiro
+            if senha_personalizada:
+                senhas_teste.insert(0, senha_personalizada)
+
+            resultado = self.testar_senhas_candidatas(salt, texto_cripto, senhas_teste)
+            if resultado is None:
+                raise Exception("Não foi possível descriptografar com as chaves disponíveis")
+
+            return resultado[1]
+        except Exception as e:
+            raise Exception(f"Erro no formato antigo: {str(e)}")
+
+    def migrar_textos_formato_antigo(self, textos, senhas_extras=None):
+        """Converter em lote textos do formato antigo para o formato atual"""
+        senhas_teste = list(self.SENHAS_LEGADAS) + list(senhas_extras or [])
+        migrados = []
+
+        for texto_criptografado in textos:
+            try:
+                dados = base64.urlsafe_b64decode(texto_criptografado.encode())
+                resultado = self.testar_senhas_candidatas(dados[:16], dados[16:], senhas_teste)
+                if resultado is None:
+                    raise Exception("Nenhuma senha candidata corresponde")
+
+                senha, texto_original = resultado
+                # Senhas extras são tratadas como senhas personalizadas no formato novo
+                senha_personalizada = None if senha in self.SENHAS_LEGADAS else senha
+                migrados.append((texto_criptografado,
+                                 self.criptografar_texto(texto_original, senha_personalizada), None))
+            except Exception as e:
+                migrados.append((texto_criptografado, None, str(e)))
+
+        return migrados
+
+
+class MenuLateralApp(CifradorTexto):
+    def __init__(self, root):
+        super().__init__()
+        self.janela = root
+        self.janela.title("CryptographiE")
+        self.janela.minsize(800, 600)
+
+        # Adicionar ícone personalizado
+        try:
+            self.janela.iconbitmap("crypto.ico")  # Coloque o arquivo icone.ico na mesma pasta
+        except:
+            pass  # Se não encontrar o arquivo, continua sem ícone
+
+        # Instância de estatísticas
+        self.estatisticas = Estatisticas()
+
+        # Tempo até a primeira janela ficar pronta (medido após o primeiro ciclo)
+        self.tempo_inicializacao = None
+
+        # Aba de estatísticas: redesenhada só quando visível e com dados alterados
+        self.estatisticas_sujas = True
+        self.versao_estatisticas_desenhada = -1
+        self.ultimo_redesenho_estatisticas = 0.0
+        self.redesenho_estatisticas_id = None
+        self.gravacao_estatisticas_id = None
+        self.dados_grafico = None
+        self.fatias_grafico = None
+
+        # Operações com arquivos rodam fora da thread do Tk
+        self.executor_tarefas = ExecutorTarefas()
+        self.janela_progresso = None
+
+        # Buffer circular com o histórico de operações com arquivos
+        self.historico_arquivos = deque(maxlen=CAPACIDADE_HISTORICO)
+        self.historico_pendente = []  # Entradas ainda não desenhadas na tela
+        self.descarga_historico_agendada = False
+        self.restaurar_status_id = None
+
+        # Log persistente de todas as operações, entre sessões
+        try:
+            self.registro_operacoes = RegistroOperacoes()
+        except OSError:
+            self.registro_operacoes = None  # Pasta sem permissão de escrita: só o histórico em memória
+
+        # Dicionário para armazenar metadados dos arquivos processados
+        self.metadados_arquivos = {}
+
+        # Variáveis para código Morse
+        self.reproduzindo = False
+        self.thread_reproducao = None
+        self.pausado = False  # Estado de pausa
+        self.evento_pausa = threading.Event()  # Evento para controlar pausa
+        self.evento_pausa.set()  # Iniciar desbloqueado
+
+        # Variáveis para Arduino
+        self.arduino_serial = None
+        self.arduino_conectado = False
+        self.arduino_porta = None
+        self.thread_arduino = None
+        self.transmitindo_arduino = False
+
+        # Variáveis para controle de login
+        self.usuario_logado = False
+        self.email_usuario_logado = ""
+
+        # Configurar comportamento responsivo
+        self.janela.columnconfigure(1, weight=1)
+        self.janela.rowconfigure(0, weight=1)
+
+        # Criar o menu lateral
+        self.criar_menu_lateral()
+
+        # Criar área principal
+        self.criar_area_principal()
+
+        # Criar menu
+        self.criar_menu()
+
+        # Criar barra de status
+        self.criar_barra_status()
 
-                senha_para_chave = senha_personalizada
-            else:
-                # Foi criptografado com senha padrão
-                if versao >= '2.2':
-                    senha_para_chave = "texto_default_2024"
-                else:
-                    # Compatibilidade com versões antigas
-                    senha_para_chave = "default_key"
+        # Mostrar primeira aba por padrão (as outras são construídas quando exibidas)
+        self.mostrar_aba("texto")
+        self.adicionar_ao_historico("Sistema iniciado - Criptografia AES-256 ativada", "SISTEMA")
 
-            # Gerar chave e descriptografar
-            key, _ = self.gerar_chave_de_senha(senha_para_chave, salt)
-            f = Fernet(key)
-            texto_descriptografado = f.decrypt(dados_criptografados).decode('utf-8')
+        # Inicializar estatísticas
+        self.atualizar_estatisticas()
 
-            # Se não é senha personalizada e temos hash, validar
-            if not senha_personalizada_flag and 'hash_texto' in dados_completos:
-                hash_esperado = dados_completos['hash_texto']
-                hash_atual = hashlib.sha256(texto_descriptografado.encode()).hexdigest()
+        # Medir o tempo até a janela ficar pronta
+        self.janela.after_idle(self.registrar_tempo_inicializacao)
 
-                if hash_esperado != hash_atual:
-                    raise Exception("Falha na validação da integridade do texto")
+    def registrar_tempo_inicializacao(self):
+        """Registrar o tempo de inicialização e compará-lo com o orçamento"""
+        self.tempo_inicializacao = time.perf_counter() - INICIO_CARREGAMENTO
+        mensagem = f"Inicialização em {self.tempo_inicializacao * 1000:.0f} ms " \
+                   f"(orçamento: {ORCAMENTO_INICIALIZACAO * 1000:.0f} ms)"
+        if self.tempo_inicializacao > ORCAMENTO_INICIALIZACAO:
+            self.adicionar_ao_historico(mensagem + " - acima do orçamento", "INFO")
+        else:
+            self.adicionar_ao_historico(mensagem, "SISTEMA")
+
+    def migrar_arquivo_textos_antigos(self):
+        """Migrar um arquivo com um texto do formato antigo por linha"""
+        origem = filedialog.askopenfilename(title="Arquivo com textos no formato antigo",
+                                            filetypes=[("Arquivos de texto", "*.txt"),
+                                                       ("Todos os arquivos", "*.*")])
+        if not origem:
+            return
 
-            return texto_descriptografado
+        destino = filedialog.asksaveasfilename(title="Salvar textos migrados",
+                                               defaultextension=".txt",
+                                               filetypes=[("Arquivos de texto", "*.txt"),
+                                                          ("Todos os arquivos", "*.*")])
+        if not destino:
+            return
 
-        except json.JSONDecodeError:
-            # Tentar formatos antigos
-            return self.descriptografar_texto_formato_antigo(texto_criptografado, senha_personalizada)
-        except Exception as e:
-            raise Exception(f"Erro na descriptografia: {str(e)}")
+        extras = simpledialog.askstring("Senhas Adicionais",
+                                        "Senhas adicionais a testar (separadas por vírgula, opcional):",
+                                        show='*')
+        senhas_extras = [senha for senha in (extras or "").split(",") if senha]
 
-    def descriptografar_texto_formato_antigo(self, texto_criptografado, senha_personalizada=None):
-        """Descriptografar texto no formato antigo (compatibilidade)"""
         try:
-            dados = base64.urlsafe_b64decode(texto_criptografado.encode())
-            salt = dados[:16]
-            texto_cripto = dados[16:]
-
-            # Lista de senhas para testar (compatibilidade)
-            senhas_teste = [
-                "texto_default_2024",  # Nova senha padrão
-                "default_key",  # Senha antiga
-                "",  # Senha vazia
-                "text_key"  # Outra variação
-            ]
+            with open(origem, "r", encoding="utf-8") as f:
+                textos = [linha.strip() for linha in f if linha.strip()]
 
-            # Se senha personalizada fornecida, tentar primeiro
-            if senha_personalizada:
-                senhas_teste.insert(0, senha_personalizada)
+            migrados = self.migrar_textos_formato_antigo(textos, senhas_extras)
+            erros = sum(1 for _, novo, _ in migrados if novo is None)
 
-            for senha in senhas_teste:
-                try:
-                    key, _ = self.gerar_chave_de_senha(senha, salt)
-                    f = Fernet(key)
-                    texto_original = f.decrypt(texto_cripto).decode('utf-8')
-                    return texto_original
-                except:
-                    continue
+            with open(destino, "w", encoding="utf-8") as f:
+                for antigo, novo, erro in migrados:
+                    f.write(f"{novo}\n" if novo is not None else f"# ERRO ({erro}): {antigo}\n")
 
-            raise Exception("Não foi possível descriptografar com as chaves disponíveis")
+            self.adicionar_ao_historico(f"Textos migrados: {len(migrados) - erros} de {len(migrados)}", "SISTEMA")
+            messagebox.showinfo("Migração Concluída",
+                                f"{len(migrados) - erros} texto(s) migrado(s), {erros} com erro.")
         except Exception as e:
-            raise Exception(f"Erro no formato antigo: {str(e)}")
+            messagebox.showerror("Erro", f"Erro ao migrar textos: {e}")
 
     def processar_texto(self):
         """Processar texto com opção de senha personalizada"""
@@ -459,13 +2402,22 @@ class MenuLateralApp:
         self.aba_atual = None
 
     def criar_abas(self):
-        """Criar todas as abas do aplicativo"""
+        """Registrar as abas do aplicativo (cada uma é construída na primeira exibição)"""
         self.abas = {}
+        self.construtores_abas = {
+            "texto": self.criar_aba_texto,
+            "arquivos": self.criar_aba_arquivos,
+            "estatisticas": self.criar_aba_estatisticas,
+            "morse": self.criar_aba_morse
+        }
 
-        self.abas["texto"] = self.criar_aba_texto()
-        self.abas["arquivos"] = self.criar_aba_arquivos()
-        self.abas["estatisticas"] = self.criar_aba_estatisticas()
-        self.abas["morse"] = self.criar_aba_morse()
+    def obter_aba(self, aba_id):
+        """Construir a aba no primeiro acesso e reutilizar os widgets depois"""
+        if aba_id not in self.abas:
+            aba = self.construtores_abas[aba_id]()
+            aba.grid_remove()  # Exibida apenas por mostrar_aba
+            self.abas[aba_id] = aba
+        return self.abas[aba_id]
 
     def criar_aba_texto(self):
         """Criar conteúdo da aba de processamento de texto"""
@@ -604,6 +2556,12 @@ class MenuLateralApp:
                 'comando': self.descriptografar_arquivo,
                 'cor': '#e74c3c',
                 'descricao': 'Restaurar arquivos únicos'
+            },
+            {
+                'texto': '📄 Ler Trecho',
+                'comando': self.ler_trecho_arquivo,
+                'cor': '#16a085',
+                'descricao': 'Descriptografar só um intervalo de bytes'
             }
         ])
 
@@ -724,8 +2682,8 @@ class MenuLateralApp:
         # Configurar tags para diferentes tipos de mensagem
         self.configurar_tags_historico()
 
-        # Inicializar histórico
-        self.adicionar_ao_historico("Sistema iniciado - Criptografia AES-256 ativada", "SISTEMA")
+        # Inicializar histórico com as últimas entradas das sessões anteriores
+        self.filtrar_historico()
 
         return aba
 
@@ -792,27 +2750,49 @@ class MenuLateralApp:
         self.area_historico.tag_configure("ERRO", foreground="#e74c3c", font=("Consolas", 9, "bold"))
         self.area_historico.tag_configure("INFO", foreground="#95a5a6", font=("Consolas", 9))
 
+    def entrada_no_filtro(self, entrada):
+        """Verificar se a entrada passa pelo filtro selecionado"""
+        filtro = self.filter_var.get()
+        return filtro == "Todos" or FILTROS_HISTORICO.get(filtro) == entrada['tipo']
+
+    def consultar_historico(self, limite=None):
+        """Entradas do filtro selecionado, lidas pelo índice do log persistente"""
+        filtro = self.filter_var.get()
+        if self.registro_operacoes:
+            return self.registro_operacoes.consultar(FILTROS_HISTORICO.get(filtro), limite=limite)
+
+        entradas = [entrada for entrada in self.historico_arquivos if self.entrada_no_filtro(entrada)]
+        return entradas[-limite:] if limite else entradas
+
     def filtrar_historico(self, event=None):
         """Filtrar histórico por tipo de operação"""
-        filtro = self.filter_var.get()
+        # Só as últimas entradas filtradas são desenhadas; as pendentes já estão incluídas
+        self.historico_pendente.clear()
+        visiveis = list(self.consultar_historico(LINHAS_HISTORICO_TELA))
 
-        # Reexibir histórico filtrado
         self.area_historico.config(state='normal')
         self.area_historico.delete('1.0', tk.END)
+        self.exibir_entradas_historico(visiveis)
+        self.area_historico.config(state='disabled')
 
-        for entrada in self.historico_arquivos:
-            tipo = entrada['tipo']
-            if filtro == "Todos" or \
-                    (filtro == "Criptografia" and tipo == "PROCESSAMENTO") or \
-                    (filtro == "Descriptografia" and tipo == "RESTAURACAO") or \
-                    (filtro == "Sistema" and tipo == "SISTEMA") or \
-                    (filtro == "Erros" and tipo == "ERRO"):
-                self.exibir_entrada_historico(entrada)
+    def exibir_entradas_historico(self, entradas):
+        """Inserir várias entradas no histórico com uma única chamada ao widget"""
+        argumentos = []
+        for entrada in entradas:
+            argumentos.extend((self.formatar_entrada_historico(entrada), entrada['tipo']))
 
-        self.area_historico.config(state='disabled')
+        if argumentos:
+            self.area_historico.insert(tk.END, *argumentos)
 
-    def exibir_entrada_historico(self, entrada):
-        """Exibir uma entrada específica no histórico"""
+        # Descartar as linhas mais antigas além do limite da tela
+        linhas = int(self.area_historico.index('end-1c').split('.')[0]) - 1
+        if linhas > LINHAS_HISTORICO_TELA:
+            self.area_historico.delete('1.0', f"{linhas - LINHAS_HISTORICO_TELA + 1}.0")
+
+        self.area_historico.see(tk.END)
+
+    def formatar_entrada_historico(self, entrada):
+        """Formatar uma entrada do histórico como linha de texto"""
         timestamp = entrada['timestamp']
         operacao = entrada['operacao']
         tipo = entrada['tipo']
@@ -829,14 +2809,7 @@ class MenuLateralApp:
         icone = icones.get(tipo, "📝")
 
         # Formatar entrada
-        linha = f"{icone} [{timestamp}] {operacao}\n"
-
-        # Inserir com tag apropriada
-        start_pos = self.area_historico.index(tk.INSERT)
-        self.area_historico.insert(tk.INSERT, linha)
-        end_pos = self.area_historico.index(tk.INSERT)
-
-        self.area_historico.tag_add(tipo, start_pos, end_pos)
+        return f"{icone} [{timestamp}] {operacao}\n"
 
     def atualizar_historico(self):
         """Atualizar exibição do histórico"""
@@ -856,7 +2829,7 @@ class MenuLateralApp:
                     f.write("HISTÓRICO DE OPERAÇÕES - CryptographiE\n")
                     f.write("=" * 50 + "\n\n")
 
-                    for entrada in self.historico_arquivos:
+                    for entrada in self.consultar_historico():
                         f.write(f"[{entrada['timestamp']}] {entrada['tipo']}: {entrada['operacao']}\n")
 
                 messagebox.showinfo("Sucesso", "Histórico exportado com sucesso!")
@@ -904,21 +2877,9 @@ class MenuLateralApp:
                                       font=("Segoe UI", 12, "bold"), bg="white", fg="#34495e")
         grafico_frame.pack(fill="both", expand=True, pady=(0, 20))
 
-        # Verificar se matplotlib está disponível
-        if matplotlib_disponivel:
-            # Criar figura do matplotlib
-            self.fig_pizza = Figure(figsize=(6, 6), dpi=100, facecolor='white')
-            self.ax_pizza = self.fig_pizza.add_subplot(111)
-
-            # Canvas para o gráfico
-            self.canvas_grafico = FigureCanvasTkAgg(self.fig_pizza, grafico_frame)
-            self.canvas_grafico.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
-        else:
-            # Fallback se matplotlib não estiver disponível
-            info_label = tk.Label(grafico_frame,
-                                  text="📊 Gráfico não disponível\n\nPara visualizar gráficos, instale:\npip install matplotlib",
-                                  font=("Segoe UI", 12), bg="white", fg="#7f8c8d", justify="center")
-            info_label.pack(expand=True, pady=50)
+        # O matplotlib só é carregado quando o gráfico for exibido pela primeira vez
+        self.grafico_frame = grafico_frame
+        self.canvas_grafico = None
 
         # Coluna direita - Controles e resumo
         right_frame = tk.Frame(main_container, bg="white", width=300)
@@ -935,7 +2896,7 @@ class MenuLateralApp:
         controles_grid.pack(fill="x", padx=15, pady=15)
 
         btn_atualizar = tk.Button(controles_grid, text="🔄 Atualizar",
-                                  command=self.atualizar_estatisticas,
+                                  command=self.redesenhar_estatisticas,
                                   bg="#3498db", fg="white", font=("Segoe UI", 10, "bold"),
                                   relief="flat", padx=15, pady=8, cursor="hand2")
         btn_atualizar.grid(row=0, column=0, sticky="ew", padx=(0, 5), pady=2)
@@ -958,6 +2919,18 @@ class MenuLateralApp:
                                 relief="flat", padx=15, pady=8, cursor="hand2")
         btn_grafico.grid(row=2, column=0, columnspan=2, sticky="ew", pady=2)
 
+        btn_cache = tk.Button(controles_grid, text="🔑 Limpar Cache de Chaves",
+                              command=self.limpar_cache_chaves,
+                              bg="#7f8c8d", fg="white", font=("Segoe UI", 10, "bold"),
+                              relief="flat", padx=15, pady=8, cursor="hand2")
+        btn_cache.grid(row=3, column=0, columnspan=2, sticky="ew", pady=2)
+
+        self.btn_fases = tk.Button(controles_grid, text="⏱️ Medir Fases: Desligado",
+                                   command=self.alternar_medicao_fases,
+                                   bg="#34495e", fg="white", font=("Segoe UI", 10, "bold"),
+                                   relief="flat", padx=15, pady=8, cursor="hand2")
+        self.btn_fases.grid(row=4, column=0, columnspan=2, sticky="ew", pady=2)
+
         controles_grid.columnconfigure(0, weight=1)
         controles_grid.columnconfigure(1, weight=1)
 
@@ -966,7 +2939,7 @@ class MenuLateralApp:
                                      font=("Segoe UI", 11, "bold"), bg="white", fg="#34495e")
         resumo_frame.pack(fill="x", pady=(0, 15))
 
-        self.resumo_texto = tk.Text(resumo_frame, height=8, width=35,
+        self.resumo_texto = tk.Text(resumo_frame, height=11, width=35,
                                     font=("Segoe UI", 9), bg="#f8f9fa",
                                     relief="flat", wrap=tk.WORD, state="disabled")
         self.resumo_texto.pack(fill="x", padx=15, pady=15)
@@ -982,59 +2955,54 @@ class MenuLateralApp:
 
         return aba
 
+    def criar_grafico(self):
+        """Carregar o matplotlib e criar o gráfico no primeiro uso; False se indisponível"""
+        if self.canvas_grafico is not None:
+            return bool(self.canvas_grafico)
+
+        backend = importar_opcional("matplotlib.backends.backend_tkagg")
+        figura = importar_opcional("matplotlib.figure")
+        if backend and figura:
+            # Criar figura do matplotlib
+            self.fig_pizza = figura.Figure(figsize=(6, 6), dpi=100, facecolor='white')
+            self.ax_pizza = self.fig_pizza.add_subplot(111)
+
+            # Canvas para o gráfico
+            self.canvas_grafico = backend.FigureCanvasTkAgg(self.fig_pizza, self.grafico_frame)
+            self.canvas_grafico.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+            return True
+
+        # Fallback se matplotlib não estiver disponível
+        self.canvas_grafico = False
+        info_label = tk.Label(self.grafico_frame,
+                              text="📊 Gráfico não disponível\n\nPara visualizar gráficos, instale:\npip install matplotlib",
+                              font=("Segoe UI", 12), bg="white", fg="#7f8c8d", justify="center")
+        info_label.pack(expand=True, pady=50)
+        return False
+
     def atualizar_grafico(self):
         """Atualizar o gráfico de pizza com dados atuais"""
-        if not matplotlib_disponivel:
+        if not self.criar_grafico():
             messagebox.showwarning("Aviso", "Matplotlib não está disponível.\nInstale com: pip install matplotlib")
             return
 
         try:
-            # Limpar gráfico anterior
-            self.ax_pizza.clear()
-
             # Obter dados
             criptografados = self.estatisticas.arquivos_criptografados
             descriptografados = self.estatisticas.arquivos_descriptografados
             total = criptografados + descriptografados
 
-            if total == 0:
-                # Exibir gráfico vazio com mensagem
-                self.ax_pizza.text(0.5, 0.5, 'Nenhuma operação\nrealizada ainda',
-                                   horizontalalignment='center', verticalalignment='center',
-                                   transform=self.ax_pizza.transAxes, fontsize=14, color='gray')
-                self.ax_pizza.set_title('Distribuição de Operações', fontsize=16, fontweight='bold', pad=20)
-            else:
-                # Dados para o gráfico
-                labels = ['Criptografados', 'Descriptografados']
-                sizes = [criptografados, descriptografados]
-                colors = ['#e74c3c', '#27ae60']  # Vermelho para cripto, verde para descripto
-
-                # Criar gráfico de pizza
-                wedges, texts, autotexts = self.ax_pizza.pie(sizes, colors=colors,
-                                                             autopct='%1.1f%%', startangle=90,
-                                                             labeldistance=None,  # Remove completamente os labels
-                                                             textprops={'fontsize': 11})
-
-                # Melhorar aparência dos textos
-                for autotext in autotexts:
-                    autotext.set_color('white')
-                    autotext.set_fontweight('bold')
-                    autotext.set_fontsize(12)
-
-                # Título
-                self.ax_pizza.set_title(f'\nTotal: {total} arquivos',
-                                        fontsize=14, fontweight='bold', pad=20)
-
-                # Adicionar legenda com valores absolutos
-                legend_labels = [f'{label}: {size} arquivo(s)' for label, size in zip(labels, sizes)]
-                self.ax_pizza.legend(wedges, legend_labels, title="Operações:",
-                                     loc="lower center", bbox_to_anchor=(0.5, -0.1))
-
-            # Garantir que o gráfico seja circular
-            self.ax_pizza.axis('equal')
-
-            # Atualizar canvas
-            self.canvas_grafico.draw()
+            dados = (criptografados, descriptografados)
+            if dados != self.dados_grafico:
+                if total and self.fatias_grafico:
+                    # Reaproveitar fatias, rótulos e legenda já existentes
+                    self.mover_fatias_grafico(dados)
+                else:
+                    self.construir_grafico(dados)
+                self.dados_grafico = dados
+
+                # Atualizar canvas no próximo ciclo ocioso
+                self.canvas_grafico.draw_idle()
 
             # Atualizar resumo
             self.atualizar_resumo()
@@ -1042,6 +3010,71 @@ class MenuLateralApp:
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao atualizar gráfico: {e}")
 
+    def construir_grafico(self, dados):
+        """Criar do zero os elementos do gráfico de pizza"""
+        self.ax_pizza.clear()
+        self.fatias_grafico = None
+        total = sum(dados)
+
+        if total == 0:
+            # Exibir gráfico vazio com mensagem
+            self.ax_pizza.text(0.5, 0.5, 'Nenhuma operação\nrealizada ainda',
+                               horizontalalignment='center', verticalalignment='center',
+                               transform=self.ax_pizza.transAxes, fontsize=14, color='gray')
+            self.ax_pizza.set_title('Distribuição de Operações', fontsize=16, fontweight='bold', pad=20)
+        else:
+            # Dados para o gráfico
+            labels = ['Criptografados', 'Descriptografados']
+            sizes = list(dados)
+            colors = ['#e74c3c', '#27ae60']  # Vermelho para cripto, verde para descripto
+
+            # Criar gráfico de pizza
+            wedges, texts, autotexts = self.ax_pizza.pie(sizes, colors=colors,
+                                                         autopct='%1.1f%%', startangle=90,
+                                                         labeldistance=None,  # Remove completamente os labels
+                                                         textprops={'fontsize': 11})
+
+            # Melhorar aparência dos textos
+            for autotext in autotexts:
+                autotext.set_color('white')
+                autotext.set_fontweight('bold')
+                autotext.set_fontsize(12)
+
+            # Título
+            self.ax_pizza.set_title(f'\nTotal: {total} arquivos',
+                                    fontsize=14, fontweight='bold', pad=20)
+
+            # Adicionar legenda com valores absolutos
+            legend_labels = [f'{label}: {size} arquivo(s)' for label, size in zip(labels, sizes)]
+            legenda = self.ax_pizza.legend(wedges, legend_labels, title="Operações:",
+                                           loc="lower center", bbox_to_anchor=(0.5, -0.1))
+
+            self.fatias_grafico = (wedges, autotexts, legenda, labels)
+
+        # Garantir que o gráfico seja circular
+        self.ax_pizza.axis('equal')
+
+    def mover_fatias_grafico(self, dados):
+        """Ajustar ângulos e textos das fatias existentes aos novos dados"""
+        wedges, autotexts, legenda, labels = self.fatias_grafico
+        total = sum(dados)
+
+        angulo = 90.0  # Mesmo ângulo inicial de construir_grafico
+        for wedge, autotext, tamanho in zip(wedges, autotexts, dados):
+            fim = angulo + 360.0 * tamanho / total
+            wedge.set_theta1(angulo)
+            wedge.set_theta2(fim)
+
+            # Percentual no meio da fatia (distância padrão de 0.6 do raio)
+            meio = math.radians((angulo + fim) / 2)
+            autotext.set_position((0.6 * math.cos(meio), 0.6 * math.sin(meio)))
+            autotext.set_text(f"{100.0 * tamanho / total:1.1f}%")
+            angulo = fim
+
+        self.ax_pizza.set_title(f'\nTotal: {total} arquivos', fontsize=14, fontweight='bold', pad=20)
+        for texto, label, tamanho in zip(legenda.get_texts(), labels, dados):
+            texto.set_text(f'{label}: {tamanho} arquivo(s)')
+
     def atualizar_resumo(self):
         """Atualizar o resumo estatístico rápido"""
         try:
@@ -1064,6 +3097,9 @@ class MenuLateralApp:
 
 💾 VOLUME TOTAL: {self.formatar_tamanho(total_tamanho)}
 
+🔑 CACHE DE CHAVES: {len(self.cache_chaves)} chave(s)
+   Acertos: {self.cache_chaves.acertos} | Falhas: {self.cache_chaves.falhas}
+
 ⏱️ SESSÃO INICIADA:
    {self.estatisticas.hora_inicio.strftime('%d/%m/%Y às %H:%M')}"""
 
@@ -1270,7 +3306,7 @@ class MenuLateralApp:
         self.btn_pausa.bind("<ButtonRelease-1>", self.on_pause_release)
 
         # Card Arduino (se disponível) mais compacto
-        if serial_disponivel:
+        if modulo_disponivel("serial"):
             arduino_card = tk.LabelFrame(right_frame, text="  🔌 Arduino  ",
                                          font=("Segoe UI", 10, "bold"),
                                          fg="#2c3e50", bg="white",
@@ -1367,7 +3403,7 @@ class MenuLateralApp:
         add_hover_effect(self.btn_pausa, "#d68910", "#f39c12")
         add_hover_effect(btn_mostrar_tabela, "#8e44ad", "#9b59b6")
 
-        if serial_disponivel:
+        if modulo_disponivel("serial"):
             add_hover_effect(self.btn_conectar_arduino, "#219a52", "#27ae60")
             add_hover_effect(self.btn_desconectar_arduino, "#c0392b", "#e74c3c")
             add_hover_effect(self.btn_transmitir_arduino, "#d68910", "#f39c12")
@@ -1380,7 +3416,7 @@ class MenuLateralApp:
         for aba in self.abas.values():
             aba.grid_remove()
 
-        self.abas[aba_id].grid(row=0, column=0, sticky="nsew")
+        self.obter_aba(aba_id).grid(row=0, column=0, sticky="nsew")
 
         for btn_id, botao in self.botoes_menu.items():
             if btn_id == aba_id:
@@ -1390,9 +3426,9 @@ class MenuLateralApp:
 
         self.aba_atual = aba_id
 
-        # Atualizar gráfico se estivermos na aba de estatísticas
-        if aba_id == "estatisticas":
-            self.janela.after(100, self.atualizar_grafico)
+        # Redesenhar estatísticas alteradas enquanto a aba estava oculta
+        if aba_id == "estatisticas" and self.estatisticas_alteradas():
+            self.agendar_redesenho_estatisticas(imediato=True)
 
     def adicionar_ao_historico(self, operacao, tipo="INFO"):
         """Adicionar uma entrada ao histórico de operações"""
@@ -1405,23 +3441,55 @@ class MenuLateralApp:
             'tipo': tipo
         }
 
+        # O buffer circular descarta sozinho as entradas mais antigas
         self.historico_arquivos.append(entrada)
+        if self.registro_operacoes:
+            self.registro_operacoes.registrar(tipo, operacao, agora.timestamp())
+        self.historico_pendente.append(entrada)
+
+        # Desenhar uma vez por ciclo da interface, não a cada entrada
+        if not self.descarga_historico_agendada:
+            self.descarga_historico_agendada = True
+            self.janela.after_idle(self.descarregar_historico)
+
+    def descarregar_historico(self):
+        """Desenhar de uma vez as entradas acumuladas desde o último ciclo"""
+        self.descarga_historico_agendada = False
+        pendentes, self.historico_pendente = self.historico_pendente, []
+        if not pendentes:
+            return
 
-        self.area_historico.config(state='normal')
-        self.exibir_entrada_historico(entrada)
-        self.area_historico.config(state='disabled')
+        with cronometro.medir("interface"):
+            self.desenhar_historico_pendente(pendentes)
+
+    def desenhar_historico_pendente(self, pendentes):
+        """Gravar no registro e exibir as entradas novas"""
+        if self.registro_operacoes:
+            self.registro_operacoes.descarregar()
+
+        # Com a aba de arquivos ainda não construída, as entradas aparecem quando ela for exibida
+        if "arquivos" in self.abas:
+            visiveis = [entrada for entrada in pendentes if self.entrada_no_filtro(entrada)]
+            self.area_historico.config(state='normal')
+            self.exibir_entradas_historico(visiveis[-LINHAS_HISTORICO_TELA:])
+            self.area_historico.config(state='disabled')
 
         # Atualizar indicador de status na interface
         if hasattr(self, 'status_indicator'):
-            if tipo == "ERRO":
+            tipos = {entrada['tipo'] for entrada in pendentes}
+            if "ERRO" in tipos:
                 self.status_indicator.config(text="● Erro Detectado", fg="#e74c3c")
-                self.janela.after(3000, lambda: self.status_indicator.config(text="● Sistema Ativo", fg="#27ae60"))
-            elif tipo in ["PROCESSAMENTO", "RESTAURACAO"]:
+                espera = 3000
+            elif tipos & {"PROCESSAMENTO", "RESTAURACAO"}:
                 self.status_indicator.config(text="● Processando...", fg="#f39c12")
-                self.janela.after(2000, lambda: self.status_indicator.config(text="● Sistema Ativo", fg="#27ae60"))
+                espera = 2000
+            else:
+                return
 
-        if len(self.historico_arquivos) > 100:
-            self.historico_arquivos.pop(0)
+            if self.restaurar_status_id:
+                self.janela.after_cancel(self.restaurar_status_id)
+            self.restaurar_status_id = self.janela.after(
+                espera, lambda: self.status_indicator.config(text="● Sistema Ativo", fg="#27ae60"))
 
     def limpar_historico(self):
         """Limpar todo o histórico de operações"""
@@ -1429,6 +3497,9 @@ class MenuLateralApp:
                                         "Deseja realmente limpar todo o histórico de operações?")
         if resultado:
             self.historico_arquivos.clear()
+            self.historico_pendente.clear()
+            if self.registro_operacoes:
+                self.registro_operacoes.limpar()
             self.area_historico.config(state='normal')
             self.area_historico.delete('1.0', tk.END)
             self.area_historico.config(state='disabled')
@@ -1507,18 +3578,23 @@ class MenuLateralApp:
         """Gerar uma nova chave de criptografia"""
         resultado = messagebox.askyesno("Gerar Nova Chave",
                                         "⚠️ ATENÇÃO ⚠️\n\n"
-                                        "Gerar uma nova chave tornará IMPOSSÍVEL descriptografar "
-                                        "arquivos criptografados com a chave atual.\n\n"
-                                        "Certifique-se de que todos os arquivos importantes "
-                                        "foram descriptografados antes de continuar.\n\n"
+                                        "A chave atual será arquivada em 'chaveiro.key' e os novos "
+                                        "arquivos usarão a nova chave.\n\n"
+                                        "Arquivos antigos continuam podendo ser descriptografados "
+                                        "enquanto 'chaveiro.key' for preservado.\n\n"
                                         "Deseja realmente gerar uma nova chave?")
         if resultado:
             try:
+                # Arquivar a chave atual antes de substituí-la
+                if os.path.exists(ARQUIVO_CHAVE):
+                    arquivar_chave(carregar_chave())
+
                 chave = Fernet.generate_key()
-                with open("chave.key", "wb") as arquivo_chave:
+                with open(ARQUIVO_CHAVE, "wb") as arquivo_chave:
                     arquivo_chave.write(chave)
                 messagebox.showinfo("Sucesso", "✅ Nova chave gerada com sucesso!\n\n"
-                                               "A nova chave foi salva em 'chave.key'")
+                                               "A nova chave foi salva em 'chave.key' e a anterior "
+                                               "foi arquivada em 'chaveiro.key'")
                 self.adicionar_ao_historico("Nova chave de criptografia gerada", "SISTEMA")
             except Exception as e:
                 messagebox.showerror("Erro", f"Erro ao gerar nova chave: {e}")
@@ -1526,15 +3602,83 @@ class MenuLateralApp:
 
     def carregar_chave(self):
         """Carregar chave de criptografia"""
+        return carregar_chave()
+
+    def carregar_chaveiro(self):
+        """Carregar a chave atual e as chaves históricas"""
+        return carregar_chaveiro()
+
+    def iniciar_tarefa(self, titulo, total, funcao, *args):
+        """Executar uma operação com arquivos em segundo plano"""
+        if self.executor_tarefas.ocupado:
+            messagebox.showwarning("Aviso", "Já existe uma operação em andamento.")
+            return False
+
+        self.janela_progresso = self.criar_janela_progresso(titulo, total)
+        self.executor_tarefas.iniciar(funcao, *args)
+        self.janela.after(int(INTERVALO_PROGRESSO * 1000), self.processar_fila_tarefas)
+        return True
+
+    def processar_fila_tarefas(self):
+        """Aplicar na interface as mensagens enviadas pela operação em andamento"""
+        with cronometro.medir("interface"):
+            finalizado, dialogos = self.aplicar_mensagens_tarefa()
+
+        # Diálogos esperam o usuário: ficam fora da medição e antes do próximo ciclo
+        for dialogo, *argumentos in dialogos:
+            dialogo(*argumentos)
+
+        if not finalizado:
+            self.janela.after(int(INTERVALO_PROGRESSO * 1000), self.processar_fila_tarefas)
+
+    def aplicar_mensagens_tarefa(self):
+        """Desenhar o progresso e tratar o fim da operação; retorna (finalizado, diálogos a mostrar)"""
+        finalizado = False
+        resultado = None
+        progresso = None
+        estatisticas_alteradas = False
+        dialogos = []
+
+        for tipo, dados in self.executor_tarefas.drenar():
+            if tipo == 'progresso':
+                # Só o último evento de progresso do ciclo é desenhado
+                progresso = dados
+            elif tipo == 'historico':
+                self.adicionar_ao_historico(*dados)
+            elif tipo == 'estatistica':
+                self.estatisticas.registrar_operacao(*dados)
+                estatisticas_alteradas = True
+            elif tipo == 'resultado':
+                resultado = dados
+            elif tipo == 'aviso':
+                resultado = None
+                dialogos.append((messagebox.showinfo, "Informação", dados[0]))
+            elif tipo == 'falha':
+                dialogos.append((messagebox.showerror, "Erro Crítico", f"Erro durante a operação: {dados[0]}"))
+            elif tipo == 'fim':
+                finalizado = True
+
+        if progresso and not finalizado:
+            self.atualizar_progresso(self.janela_progresso, *progresso)
+
+        # Com a aba visível, acompanhar a operação no ritmo limitado de redesenho
+        if estatisticas_alteradas and not finalizado:
+            self.atualizar_estatisticas()
+
+        if not finalizado:
+            return False, dialogos
+
+        # Fechar janela de progresso
         try:
-            with open("chave.key", "rb") as arquivo_chave:
-                return arquivo_chave.read()
-        except FileNotFoundError:
-            # Gerar nova chave se não existir
-            chave = Fernet.generate_key()
-            with open("chave.key", "wb") as arquivo_chave:
-                arquivo_chave.write(chave)
-            return chave
+            self.janela_progresso.destroy()
+        except tk.TclError:
+            pass
+        self.janela_progresso = None
+
+        if resultado:
+            dialogos.append((self.mostrar_resultado_operacao, *resultado))
+        self.atualizar_estatisticas()
+        return True, dialogos
 
     def criptografar_arquivo(self):
         """Criptografar arquivo único - VERSÃO MELHORADA"""
@@ -1551,59 +3695,51 @@ class MenuLateralApp:
         if not opcoes:
             return
 
-        try:
-            chave = self.carregar_chave()
-            fernet = Fernet(chave)
-
-            arquivos_processados = 0
-            erros = 0
-            total_arquivos = len(arquivos)
-
-            # Criar janela de progresso
-            progresso = self.criar_janela_progresso("Criptografando arquivos...", total_arquivos)
-
-            for i, arquivo in enumerate(arquivos):
-                try:
-                    # Atualizar progresso
-                    self.atualizar_progresso(progresso, i, total_arquivos,
-                                             f"Processando: {os.path.basename(arquivo)}")
+        self.iniciar_tarefa("Criptografando arquivos...", len(arquivos),
+                            self.tarefa_criptografar_arquivos, arquivos, opcoes)
 
-                    with open(arquivo, "rb") as f:
-                        conteudo = f.read()
-                        tamanho_arquivo = len(conteudo)
+    def tarefa_criptografar_arquivos(self, tarefa, arquivos, opcoes):
+        """Criptografar arquivos selecionados (executa em segundo plano)"""
+        chave = self.carregar_chave()
 
-                    conteudo_criptografado = fernet.encrypt(conteudo)
+        arquivos_processados = 0
+        erros = 0
+        total_arquivos = len(arquivos)
+        bytes_processados = 0
 
-                    if opcoes['backup']:
-                        import shutil
-                        shutil.copy2(arquivo, arquivo + ".bak")
+        for i, arquivo in enumerate(arquivos):
+            if tarefa.cancelado.is_set():
+                tarefa.enviar('historico', "Operação cancelada pelo usuário", "SISTEMA")
+                break
 
-                    with open(arquivo, "wb") as f:
-                        f.write(conteudo_criptografado)
+            try:
+                # Atualizar progresso
+                tarefa.enviar('progresso', i, total_arquivos, f"Processando: {os.path.basename(arquivo)}",
+                              bytes_processados)
 
-                    self.adicionar_ao_historico(
-                        f"Arquivo criptografado: {os.path.basename(arquivo)} ({self.formatar_tamanho(tamanho_arquivo)})",
-                        "PROCESSAMENTO"
-                    )
-                    arquivos_processados += 1
+                if opcoes['backup']:
+                    with cronometro.medir("backup"):
+                        criar_backup(arquivo, permitir_hardlink=True)
 
-                    _, extensao = os.path.splitext(arquivo)
-                    self.estatisticas.registrar_operacao('criptografar', tamanho_arquivo, extensao)
+                # Criptografia em segmentos, sem carregar o arquivo inteiro na memória
+                tamanho_arquivo = criptografar_arquivo_em_disco(arquivo, chave, os.cpu_count() or 1,
+                                                                opcoes['compressao'])
+                bytes_processados += tamanho_arquivo
 
-                except Exception as e:
-                    erro_msg = f"Erro ao criptografar '{os.path.basename(arquivo)}': {e}"
-                    self.adicionar_ao_historico(erro_msg, "ERRO")
-                    erros += 1
+                tarefa.enviar('historico',
+                              f"Arquivo criptografado: {os.path.basename(arquivo)} ({self.formatar_tamanho(tamanho_arquivo)})",
+                              "PROCESSAMENTO")
+                arquivos_processados += 1
 
-            # Fechar janela de progresso
-            progresso.destroy()
+                _, extensao = os.path.splitext(arquivo)
+                tarefa.enviar('estatistica', 'criptografar', tamanho_arquivo, extensao)
 
-            # Mostrar resultado
-            self.mostrar_resultado_operacao("Criptografia", arquivos_processados, erros, total_arquivos)
-            self.atualizar_estatisticas()
+            except Exception as e:
+                erro_msg = f"Erro ao criptografar '{os.path.basename(arquivo)}': {e}"
+                tarefa.enviar('historico', erro_msg, "ERRO")
+                erros += 1
 
-        except Exception as e:
-            messagebox.showerror("Erro Crítico", f"Erro durante a operação: {e}")
+        tarefa.enviar('resultado', "Criptografia", arquivos_processados, erros, total_arquivos)
 
     def descriptografar_arquivo(self):
         """Descriptografar arquivo único - VERSÃO MELHORADA"""
@@ -1615,61 +3751,100 @@ class MenuLateralApp:
         if not arquivos:
             return
 
-        try:
-            chave = self.carregar_chave()
-            fernet = Fernet(chave)
+        self.iniciar_tarefa("Descriptografando arquivos...", len(arquivos),
+                            self.tarefa_descriptografar_arquivos, arquivos)
+
+    def tarefa_descriptografar_arquivos(self, tarefa, arquivos):
+        """Descriptografar arquivos selecionados (executa em segundo plano)"""
+        chaveiro = self.carregar_chaveiro()
+
+        arquivos_processados = 0
+        erros = 0
+        total_arquivos = len(arquivos)
+        bytes_processados = 0
+
+        for i, arquivo in enumerate(arquivos):
+            if tarefa.cancelado.is_set():
+                tarefa.enviar('historico', "Operação cancelada pelo usuário", "SISTEMA")
+                break
 
-            arquivos_processados = 0
-            erros = 0
-            total_arquivos = len(arquivos)
+            try:
+                # Atualizar progresso
+                tarefa.enviar('progresso', i, total_arquivos, f"Processando: {os.path.basename(arquivo)}",
+                              bytes_processados)
 
-            # Criar janela de progresso
-            progresso = self.criar_janela_progresso("Descriptografando arquivos...", total_arquivos)
+                tamanho_arquivo = os.path.getsize(arquivo)
+                bytes_processados += tamanho_arquivo
 
-            for i, arquivo in enumerate(arquivos):
                 try:
-                    # Atualizar progresso
-                    self.atualizar_progresso(progresso, i, total_arquivos,
-                                             f"Processando: {os.path.basename(arquivo)}")
+                    # Aceita o formato de contêiner e tokens Fernet legados
+                    descriptografar_arquivo_em_disco(arquivo, chaveiro, os.cpu_count() or 1)
 
-                    with open(arquivo, "rb") as f:
-                        conteudo_criptografado = f.read()
-                        tamanho_arquivo = len(conteudo_criptografado)
+                    tarefa.enviar('historico',
+                                  f"Arquivo descriptografado: {os.path.basename(arquivo)} ({self.formatar_tamanho(tamanho_arquivo)})",
+                                  "RESTAURACAO")
+                    arquivos_processados += 1
 
-                    try:
-                        conteudo_descriptografado = fernet.decrypt(conteudo_criptografado)
+                    _, extensao = os.path.splitext(arquivo)
+                    tarefa.enviar('estatistica', 'descriptografar', tamanho_arquivo, extensao)
 
-                        with open(arquivo, "wb") as f:
-                            f.write(conteudo_descriptografado)
+                except Exception:
+                    erro_msg = f"Falha ao descriptografar '{os.path.basename(arquivo)}' - Chave incorreta ou arquivo não criptografado"
+                    tarefa.enviar('historico', erro_msg, "ERRO")
+                    erros += 1
 
-                        self.adicionar_ao_historico(
-                            f"Arquivo descriptografado: {os.path.basename(arquivo)} ({self.formatar_tamanho(tamanho_arquivo)})",
-                            "RESTAURACAO"
-                        )
-                        arquivos_processados += 1
+            except Exception as e:
+                erro_msg = f"Erro ao abrir '{os.path.basename(arquivo)}': {e}"
+                tarefa.enviar('historico', erro_msg, "ERRO")
+                erros += 1
 
-                        _, extensao = os.path.splitext(arquivo)
-                        self.estatisticas.registrar_operacao('descriptografar', tamanho_arquivo, extensao)
+        tarefa.enviar('resultado', "Descriptografia", arquivos_processados, erros, total_arquivos)
 
-                    except Exception:
-                        erro_msg = f"Falha ao descriptografar '{os.path.basename(arquivo)}' - Chave incorreta ou arquivo não criptografado"
-                        self.adicionar_ao_historico(erro_msg, "ERRO")
-                        erros += 1
+    def ler_trecho_arquivo(self):
+        """Descriptografar um intervalo de bytes de um arquivo grande para um arquivo novo"""
+        arquivo = filedialog.askopenfilename(
+            title="📄 Selecione o arquivo criptografado",
+            filetypes=[("Todos os arquivos", "*.*")]
+        )
+        if not arquivo:
+            return
 
-                except Exception as e:
-                    erro_msg = f"Erro ao abrir '{os.path.basename(arquivo)}': {e}"
-                    self.adicionar_ao_historico(erro_msg, "ERRO")
-                    erros += 1
+        inicio = simpledialog.askinteger("Ler Trecho", "Primeiro byte (negativo conta a partir do fim):",
+                                         initialvalue=-1024 * 1024, parent=self.janela)
+        if inicio is None:
+            return
+        tamanho = simpledialog.askinteger("Ler Trecho", "Quantidade de bytes:",
+                                          initialvalue=1024 * 1024, minvalue=1, parent=self.janela)
+        if tamanho is None:
+            return
 
-            # Fechar janela de progresso
-            progresso.destroy()
+        destino = filedialog.asksaveasfilename(title="Salvar trecho como",
+                                               initialfile=os.path.basename(arquivo) + ".trecho")
+        if not destino:
+            return
 
-            # Mostrar resultado
-            self.mostrar_resultado_operacao("Descriptografia", arquivos_processados, erros, total_arquivos)
-            self.atualizar_estatisticas()
+        self.iniciar_tarefa("Lendo trecho...", 1, self.tarefa_ler_trecho, arquivo, inicio, tamanho, destino)
 
+    def tarefa_ler_trecho(self, tarefa, arquivo, inicio, tamanho, destino):
+        """Gravar o trecho descriptografado (executa em segundo plano)"""
+        nome = os.path.basename(arquivo)
+        tarefa.enviar('progresso', 0, 1, f"Processando: {nome}")
+        try:
+            with open(destino, "wb") as saida:
+                escritos = descriptografar_intervalo(arquivo, self.carregar_chaveiro(), inicio, tamanho, saida)
         except Exception as e:
-            messagebox.showerror("Erro Crítico", f"Erro durante a operação: {e}")
+            try:
+                os.remove(destino)
+            except OSError:
+                pass
+            tarefa.enviar('historico', f"Falha ao ler trecho de '{nome}': {e}", "ERRO")
+            tarefa.enviar('resultado', "Leitura de Trecho", 0, 1, 1)
+            return
+
+        tarefa.enviar('historico',
+                      f"Trecho de {nome} salvo em {os.path.basename(destino)} ({self.formatar_tamanho(escritos)})",
+                      "RESTAURACAO")
+        tarefa.enviar('resultado', "Leitura de Trecho", 1, 0, 1)
 
     def criptografar_pasta(self):
         """Criptografar pasta inteira - VERSÃO MELHORADA"""
@@ -1682,80 +3857,8 @@ class MenuLateralApp:
         if not opcoes:
             return
 
-        try:
-            chave = self.carregar_chave()
-            fernet = Fernet(chave)
-
-            # Coletar todos os arquivos
-            arquivos_para_processar = []
-            for pasta_atual, subpastas, arquivos in os.walk(pasta):
-                if not opcoes['subpastas'] and pasta_atual != pasta:
-                    continue
-
-                for arquivo in arquivos:
-                    if arquivo.endswith(".bak") and not opcoes['incluir_backup']:
-                        continue
-
-                    caminho_completo = os.path.join(pasta_atual, arquivo)
-                    arquivos_para_processar.append(caminho_completo)
-
-            if not arquivos_para_processar:
-                messagebox.showinfo("Informação", "Nenhum arquivo encontrado para processar.")
-                return
-
-            total_arquivos = len(arquivos_para_processar)
-            arquivos_processados = 0
-            erros = 0
-
-            # Criar janela de progresso
-            progresso = self.criar_janela_progresso(f"Criptografando pasta: {os.path.basename(pasta)}", total_arquivos)
-
-            for i, caminho_completo in enumerate(arquivos_para_processar):
-                try:
-                    arquivo = os.path.basename(caminho_completo)
-
-                    # Atualizar progresso
-                    self.atualizar_progresso(progresso, i, total_arquivos, f"Processando: {arquivo}")
-
-                    with open(caminho_completo, "rb") as f:
-                        conteudo = f.read()
-
-                    # Verificar se já está criptografado
-                    try:
-                        fernet.decrypt(conteudo)
-                        self.adicionar_ao_historico(f"Arquivo já criptografado: {arquivo}", "INFO")
-                        continue
-                    except:
-                        pass
-
-                    conteudo_criptografado = fernet.encrypt(conteudo)
-
-                    if opcoes['backup']:
-                        import shutil
-                        shutil.copy2(caminho_completo, caminho_completo + ".bak")
-
-                    with open(caminho_completo, "wb") as f:
-                        f.write(conteudo_criptografado)
-
-                    self.adicionar_ao_historico(f"Criptografado: {arquivo}", "PROCESSAMENTO")
-                    arquivos_processados += 1
-
-                    _, extensao = os.path.splitext(caminho_completo)
-                    self.estatisticas.registrar_operacao('criptografar', len(conteudo), extensao)
-
-                except Exception as e:
-                    self.adicionar_ao_historico(f"Erro em {arquivo}: {str(e)}", "ERRO")
-                    erros += 1
-
-            # Fechar janela de progresso
-            progresso.destroy()
-
-            # Mostrar resultado
-            self.mostrar_resultado_operacao("Criptografia de Pasta", arquivos_processados, erros, total_arquivos)
-            self.atualizar_estatisticas()
-
-        except Exception as e:
-            messagebox.showerror("Erro Crítico", f"Erro durante a operação: {e}")
+        self.iniciar_tarefa(f"Criptografando pasta: {os.path.basename(pasta)}", 0,
+                            self.tarefa_processar_pasta, pasta, 'criptografar', opcoes)
 
     def descriptografar_pasta(self):
         """Descriptografar pasta inteira - VERSÃO MELHORADA"""
@@ -1768,82 +3871,96 @@ class MenuLateralApp:
         if not opcoes:
             return
 
-        try:
-            chave = self.carregar_chave()
-            fernet = Fernet(chave)
-
-            # Coletar todos os arquivos
-            arquivos_para_processar = []
-            for pasta_atual, subpastas, arquivos in os.walk(pasta):
-                if not opcoes['subpastas'] and pasta_atual != pasta:
-                    continue
-
-                for arquivo in arquivos:
-                    if arquivo.endswith(".bak") and not opcoes['incluir_backup']:
-                        continue
-
-                    caminho_completo = os.path.join(pasta_atual, arquivo)
-                    arquivos_para_processar.append(caminho_completo)
-
-            if not arquivos_para_processar:
-                messagebox.showinfo("Informação", "Nenhum arquivo encontrado para processar.")
-                return
-
-            total_arquivos = len(arquivos_para_processar)
-            arquivos_processados = 0
-            erros = 0
-
-            # Criar janela de progresso
-            progresso = self.criar_janela_progresso(f"Descriptografando pasta: {os.path.basename(pasta)}",
-                                                    total_arquivos)
-
-            for i, caminho_completo in enumerate(arquivos_para_processar):
-                try:
-                    arquivo = os.path.basename(caminho_completo)
+        self.iniciar_tarefa(f"Descriptografando pasta: {os.path.basename(pasta)}", 0,
+                            self.tarefa_processar_pasta, pasta, 'descriptografar', opcoes)
 
-                    # Atualizar progresso
-                    self.atualizar_progresso(progresso, i, total_arquivos, f"Processando: {arquivo}")
+    def tarefa_processar_pasta(self, tarefa, pasta, operacao, opcoes):
+        """Criptografar ou descriptografar uma pasta (executa em segundo plano)"""
+        criptografando = operacao == 'criptografar'
 
-                    with open(caminho_completo, "rb") as f:
-                        conteudo_criptografado = f.read()
+        # Garante que a chave exista antes de os processos a carregarem
+        self.carregar_chave()
 
-                    try:
-                        conteudo_descriptografado = fernet.decrypt(conteudo_criptografado)
+        # Coletar todos os arquivos (apenas stat, sem ler o conteúdo)
+        tarefa.enviar('progresso', -1, 0, "Listando arquivos...")
+        arquivos_encontrados, arquivos_para_processar, manifesto = selecionar_arquivos_pasta(
+            pasta, operacao, opcoes['subpastas'], opcoes['incluir_backup'], opcoes['manifesto'])
+        if not arquivos_encontrados:
+            tarefa.enviar('aviso', "Nenhum arquivo encontrado para processar.")
+            return
 
-                        with open(caminho_completo, "wb") as f:
-                            f.write(conteudo_descriptografado)
+        inalterados = len(arquivos_encontrados) - len(arquivos_para_processar)
+        if inalterados:
+            tarefa.enviar('historico', f"{inalterados} arquivo(s) inalterado(s) ignorado(s) pelo manifesto", "INFO")
 
-                        self.adicionar_ao_historico(f"Descriptografado: {arquivo}", "RESTAURACAO")
-                        arquivos_processados += 1
+        if not arquivos_para_processar:
+            manifesto.salvar()
+            tarefa.enviar('aviso', "Nenhum arquivo novo ou alterado desde a última execução.")
+            return
 
-                        _, extensao = os.path.splitext(caminho_completo)
-                        self.estatisticas.registrar_operacao('descriptografar', len(conteudo_criptografado),
-                                                             extensao)
+        total_arquivos = len(arquivos_para_processar)
+        arquivos_processados = 0
+        erros = 0
+        bytes_processados = 0
 
-                    except:
-                        self.adicionar_ao_historico(f"Arquivo não criptografado ou chave inválida: {arquivo}",
-                                                    "INFO")
+        # Distribuir os arquivos entre os processos do pool
+        backup = opcoes['backup'] and criptografando
+        tarefas = [(caminho, operacao, backup) for caminho in arquivos_para_processar]
+        try:
+            # Ao cancelar, o motor para de iniciar arquivos e devolve os que estavam em andamento
+            resultados = processar_com_deduplicacao(tarefas, opcoes['processos'],
+                                                    por_conteudo=opcoes['deduplicar'],
+                                                    compressao=opcoes['compressao'],
+                                                    cancelado=tarefa.cancelado)
+            for i, resultado in enumerate(resultados):
+                arquivo = os.path.basename(resultado['caminho'])
+                bytes_processados += resultado['tamanho']
+
+                # Atualizar progresso
+                tarefa.enviar('progresso', i, total_arquivos, f"Processando: {arquivo}", bytes_processados)
+
+                registrar_resultado_manifesto(manifesto, resultado)
+
+                if resultado['status'] == 'ok':
+                    if resultado['duplicata_de']:
+                        tarefa.enviar('historico',
+                                      f"Criptografado (duplicata de {os.path.basename(resultado['duplicata_de'])}): "
+                                      f"{arquivo}", "PROCESSAMENTO")
+                    elif criptografando:
+                        tarefa.enviar('historico', f"Criptografado: {arquivo}", "PROCESSAMENTO")
+                    else:
+                        tarefa.enviar('historico', f"Descriptografado: {arquivo}", "RESTAURACAO")
+                    if resultado['erro']:
+                        tarefa.enviar('historico', f"Aviso em {arquivo}: {resultado['erro']}", "INFO")
+                    arquivos_processados += 1
 
-                except Exception as e:
-                    self.adicionar_ao_historico(f"Erro em {arquivo}: {str(e)}", "ERRO")
+                    _, extensao = os.path.splitext(resultado['caminho'])
+                    tarefa.enviar('estatistica', operacao, resultado['tamanho'], extensao)
+                elif resultado['status'] == 'ignorado':
+                    if criptografando:
+                        tarefa.enviar('historico', f"Arquivo já criptografado: {arquivo}", "INFO")
+                    else:
+                        motivo = f" ({resultado['erro']})" if resultado['erro'] else ""
+                        tarefa.enviar('historico', f"Arquivo não criptografado: {arquivo}{motivo}", "INFO")
+                else:
+                    tarefa.enviar('historico', f"Erro em {arquivo}: {resultado['erro']}", "ERRO")
                     erros += 1
 
-            # Fechar janela de progresso
-            progresso.destroy()
-
-            # Mostrar resultado
-            self.mostrar_resultado_operacao("Descriptografia de Pasta", arquivos_processados, erros,
-                                            total_arquivos)
-            self.atualizar_estatisticas()
+            if tarefa.cancelado.is_set():
+                tarefa.enviar('historico', "Operação cancelada pelo usuário", "SISTEMA")
+        finally:
+            # O que já foi processado fica registrado mesmo após cancelamento ou erro
+            if manifesto:
+                manifesto.salvar()
 
-        except Exception as e:
-            messagebox.showerror("Erro Crítico", f"Erro durante a operação: {e}")
+        titulo = "Criptografia de Pasta" if criptografando else "Descriptografia de Pasta"
+        tarefa.enviar('resultado', titulo, arquivos_processados, erros, total_arquivos)
 
     def mostrar_opcoes_criptografia(self):
         """Mostrar diálogo de opções para criptografia"""
         opcoes_window = tk.Toplevel(self.janela)
         opcoes_window.title("Opções de Criptografia")
-        opcoes_window.geometry("350x200")
+        opcoes_window.geometry("350x235")
         opcoes_window.transient(self.janela)
         opcoes_window.grab_set()
         opcoes_window.resizable(False, False)
@@ -1856,7 +3973,8 @@ class MenuLateralApp:
 
         # Variáveis
         backup_var = tk.BooleanVar(value=True)
-        resultado = {"backup": False, "confirmado": False}
+        compressao_var = tk.StringVar(value="")
+        resultado = {"backup": False, "compressao": None, "confirmado": False}
 
         # Header
         header = tk.Frame(opcoes_window, bg="#3498db", height=50)
@@ -1884,12 +4002,15 @@ class MenuLateralApp:
                               font=("Segoe UI", 8), fg="#7f8c8d", bg="white")
         info_label.pack(anchor="w", padx=20)
 
+        self.criar_opcao_compressao(content, compressao_var)
+
         # Botões
         buttons_frame = tk.Frame(content, bg="white")
         buttons_frame.pack(fill="x", pady=(20, 0))
 
         def confirmar():
             resultado["backup"] = backup_var.get()
+            resultado["compressao"] = compressao_var.get() or None
             resultado["confirmado"] = True
             opcoes_window.destroy()
 
@@ -1906,12 +4027,23 @@ class MenuLateralApp:
         opcoes_window.wait_window()
         return resultado if resultado["confirmado"] else None
 
+    def criar_opcao_compressao(self, content, compressao_var):
+        """Linha de escolha do codec de compressão nos diálogos de opções"""
+        compressao_frame = tk.Frame(content, bg="white")
+        compressao_frame.pack(fill="x", pady=5)
+
+        tk.Label(compressao_frame, text="Compressão:", font=("Segoe UI", 10),
+                 bg="white").pack(side="left")
+        for texto, valor in (("Nenhuma", ""), ("zlib", "zlib"), ("lzma", "lzma")):
+            tk.Radiobutton(compressao_frame, text=texto, value=valor, variable=compressao_var,
+                           font=("Segoe UI", 10), bg="white").pack(side="left", padx=(5, 0))
+
     def mostrar_opcoes_pasta(self, descriptografar=False):
         """Mostrar diálogo de opções para processamento de pasta"""
         opcoes_window = tk.Toplevel(self.janela)
         title = "Opções de Descriptografia" if descriptografar else "Opções de Criptografia"
         opcoes_window.title(title)
-        opcoes_window.geometry("400x280")
+        opcoes_window.geometry("430x350" if descriptografar else "430x420")
         opcoes_window.transient(self.janela)
         opcoes_window.grab_set()
         opcoes_window.resizable(False, False)
@@ -1926,7 +4058,12 @@ class MenuLateralApp:
         subpastas_var = tk.BooleanVar(value=True)
         backup_var = tk.BooleanVar(value=True)
         incluir_backup_var = tk.BooleanVar(value=False)
-        resultado = {"subpastas": False, "backup": False, "incluir_backup": False, "confirmado": False}
+        processos_var = tk.IntVar(value=os.cpu_count() or 1)
+        manifesto_var = tk.BooleanVar(value=True)
+        deduplicar_var = tk.BooleanVar(value=False)
+        compressao_var = tk.StringVar(value="")
+        resultado = {"subpastas": False, "backup": False, "incluir_backup": False, "processos": 1,
+                     "manifesto": False, "deduplicar": False, "compressao": None, "confirmado": False}
 
         # Header
         header = tk.Frame(opcoes_window, bg="#8e44ad", height=50)
@@ -1960,6 +4097,16 @@ class MenuLateralApp:
                            variable=backup_var, font=("Segoe UI", 10),
                            bg="white").pack(anchor="w")
 
+            # Opção de deduplicação (apenas para criptografia)
+            deduplicar_frame = tk.Frame(content, bg="white")
+            deduplicar_frame.pack(fill="x", pady=5)
+
+            tk.Checkbutton(deduplicar_frame, text="Criptografar arquivos idênticos uma única vez",
+                           variable=deduplicar_var, font=("Segoe UI", 10),
+                           bg="white").pack(anchor="w")
+
+            self.criar_opcao_compressao(content, compressao_var)
+
         # Opção de incluir arquivos .bak
         bak_frame = tk.Frame(content, bg="white")
         bak_frame.pack(fill="x", pady=5)
@@ -1968,6 +4115,23 @@ class MenuLateralApp:
                        variable=incluir_backup_var, font=("Segoe UI", 10),
                        bg="white").pack(anchor="w")
 
+        # Opção de manifesto (execuções incrementais)
+        manifesto_frame = tk.Frame(content, bg="white")
+        manifesto_frame.pack(fill="x", pady=5)
+
+        tk.Checkbutton(manifesto_frame, text="Processar apenas arquivos novos ou alterados (manifesto)",
+                       variable=manifesto_var, font=("Segoe UI", 10),
+                       bg="white").pack(anchor="w")
+
+        # Quantidade de processos em paralelo
+        processos_frame = tk.Frame(content, bg="white")
+        processos_frame.pack(fill="x", pady=5)
+
+        tk.Label(processos_frame, text="Processos em paralelo:", font=("Segoe UI", 10),
+                 bg="white").pack(side="left")
+        tk.Spinbox(processos_frame, from_=1, to=max(64, os.cpu_count() or 1), width=5,
+                   textvariable=processos_var, font=("Segoe UI", 10)).pack(side="left", padx=(5, 0))
+
         # Informações
         info_frame = tk.LabelFrame(content, text="Informações", font=("Segoe UI", 9))
         info_frame.pack(fill="x", pady=10)
@@ -1992,6 +4156,13 @@ class MenuLateralApp:
             resultado["subpastas"] = subpastas_var.get()
             resultado["backup"] = backup_var.get() if not descriptografar else False
             resultado["incluir_backup"] = incluir_backup_var.get()
+            resultado["manifesto"] = manifesto_var.get()
+            resultado["deduplicar"] = deduplicar_var.get() if not descriptografar else False
+            resultado["compressao"] = compressao_var.get() or None
+            try:
+                resultado["processos"] = max(1, processos_var.get())
+            except tk.TclError:
+                resultado["processos"] = os.cpu_count() or 1
             resultado["confirmado"] = True
             opcoes_window.destroy()
 
@@ -2013,7 +4184,7 @@ class MenuLateralApp:
         """Criar janela de progresso"""
         progresso_window = tk.Toplevel(self.janela)
         progresso_window.title("Processando...")
-        progresso_window.geometry("450x150")
+        progresso_window.geometry("450x205")
         progresso_window.transient(self.janela)
         progresso_window.grab_set()
         progresso_window.resizable(False, False)
@@ -2052,16 +4223,36 @@ class MenuLateralApp:
                                                    font=("Segoe UI", 9), bg="white", fg="#7f8c8d")
         progresso_window.progress_label.pack(pady=(5, 0))
 
-        progresso_window.update()
+        # Vazão e tempo restante estimado
+        progresso_window.taxa_label = tk.Label(content, text="Calculando velocidade...",
+                                               font=("Segoe UI", 9), bg="white", fg="#7f8c8d")
+        progresso_window.taxa_label.pack()
+        progresso_window.medidor = MedidorProgresso()
+
+        # Cancelamento da operação em segundo plano
+        tk.Button(content, text="Cancelar", command=self.executor_tarefas.cancelar,
+                  font=("Segoe UI", 9), bg="#e74c3c", fg="white", relief="flat",
+                  cursor="hand2").pack(pady=(8, 0))
+        progresso_window.protocol("WM_DELETE_WINDOW", self.executor_tarefas.cancelar)
+
         return progresso_window
 
-    def atualizar_progresso(self, janela_progresso, atual, total, status):
+    def atualizar_progresso(self, janela_progresso, atual, total, status, bytes_processados=0):
         """Atualizar janela de progresso"""
         try:
+            janela_progresso.progress_bar['maximum'] = max(total, 1)
             janela_progresso.progress_bar['value'] = atual + 1
             janela_progresso.status_label.config(text=status)
             janela_progresso.progress_label.config(text=f"{atual + 1} / {total}")
-            janela_progresso.update()
+
+            medidor = janela_progresso.medidor
+            medidor.registrar(atual + 1, bytes_processados)
+            taxas = medidor.taxas()
+            if taxas:
+                restante = medidor.tempo_restante(total - atual - 1)
+                eta = "--:--" if restante is None else time.strftime("%H:%M:%S", time.gmtime(restante))
+                janela_progresso.taxa_label.config(
+                    text=f"{self.formatar_tamanho(taxas[0])}/s • {taxas[1]:.1f} arquivos/s • Restante: {eta}")
         except:
             pass  # Janela pode ter sido fechada
 
@@ -2149,16 +4340,49 @@ class MenuLateralApp:
 
     def formatar_tamanho(self, tamanho_bytes):
         """Formatar tamanho em bytes para formato legível"""
-        for unidade in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if tamanho_bytes < 1024.0:
-                return f"{tamanho_bytes:.1f} {unidade}"
-            tamanho_bytes /= 1024.0
-        return f"{tamanho_bytes:.1f} PB"
+        return formatar_tamanho(tamanho_bytes)
 
         # Métodos para estatísticas
 
     def atualizar_estatisticas(self):
-        """Atualizar exibição de estatísticas"""
+        """Marcar as estatísticas como alteradas e redesenhar se a aba estiver visível"""
+        self.estatisticas_sujas = True
+        if getattr(self, 'aba_atual', None) == "estatisticas":
+            self.agendar_redesenho_estatisticas()
+
+        # O lote é gravado por quantidade em registrar_operacao; o resto, após um tempo ocioso
+        if self.estatisticas.total_pendentes and not self.gravacao_estatisticas_id:
+            self.gravacao_estatisticas_id = self.janela.after(int(INTERVALO_ESTATISTICAS * 1000),
+                                                              self.gravar_estatisticas_pendentes)
+
+    def gravar_estatisticas_pendentes(self):
+        self.gravacao_estatisticas_id = None
+        self.estatisticas.salvar()
+
+    def estatisticas_alteradas(self):
+        return self.estatisticas_sujas or self.versao_estatisticas_desenhada != self.estatisticas.versao
+
+    def agendar_redesenho_estatisticas(self, imediato=False):
+        """Agendar um redesenho, respeitando o intervalo mínimo entre redesenhos"""
+        if self.redesenho_estatisticas_id:
+            if not imediato:
+                return
+            self.janela.after_cancel(self.redesenho_estatisticas_id)
+
+        espera = 0 if imediato else max(
+            0.0, INTERVALO_REDESENHO_ESTATISTICAS - (time.monotonic() - self.ultimo_redesenho_estatisticas))
+        self.redesenho_estatisticas_id = self.janela.after(int(espera * 1000), self.redesenhar_estatisticas)
+
+    def redesenhar_estatisticas(self):
+        """Reconstruir o relatório detalhado, o resumo e o gráfico"""
+        if self.redesenho_estatisticas_id:
+            self.janela.after_cancel(self.redesenho_estatisticas_id)
+            self.redesenho_estatisticas_id = None
+
+        self.estatisticas_sujas = False
+        self.versao_estatisticas_desenhada = self.estatisticas.versao
+        self.ultimo_redesenho_estatisticas = time.monotonic()
+
         self.area_estatisticas.delete("1.0", tk.END)
 
         def bytes_para_legivel(tamanho_bytes):
@@ -2195,18 +4419,35 @@ class MenuLateralApp:
 
         texto_stats += f"""
             INFORMAÇÕES TÉCNICAS:
-            • Algoritmo: AES-256 (Fernet)
-            • Derivação de chave: PBKDF2 com SHA-256
+            • Textos: AES-256-GCM (envelope versão 3; formatos Fernet antigos só na leitura)
+            • Derivação de chave: PBKDF2 com SHA-256 (HKDF por mensagem no modo sessão)
             • Iterações: 100.000
-            • Modo de operação: CBC com autenticação
+            • Cache de chaves: {len(self.cache_chaves)}/{self.cache_chaves.capacidade} entradas, validade de {self.cache_chaves.validade} s
+            • Acertos no cache: {self.cache_chaves.acertos} | Falhas: {self.cache_chaves.falhas}
+            • Modo de operação: GCM (autenticado, com o cabeçalho como dado associado)
+            • Arquivos: AES-256-GCM em segmentos de 1 MB (contêiner CRYE, chave própria por arquivo)
             • Sessão iniciada: {self.estatisticas.hora_inicio.strftime('%d/%m/%Y %H:%M:%S')}
+            • Tempo de inicialização: {f"{self.tempo_inicializacao * 1000:.0f} ms" if self.tempo_inicializacao else "medindo..."} (orçamento: {ORCAMENTO_INICIALIZACAO * 1000:.0f} ms)
+            """
+
+        fases = cronometro.resumo()
+        if fases:
+            texto_stats += """
+            TEMPO POR FASE:
             """
+            for fase, dados in fases.items():
+                texto_stats += (f"• {fase}: {dados['segundos']:.3f} s em {dados['medicoes']} medições "
+                                f"(média {dados['media_ms']:.3f} ms)\n")
+                faixas = ", ".join(f"{faixa} µs: {quantidade}" for faixa, quantidade in dados['histograma_us'].items())
+                texto_stats += f"    {faixas}\n"
 
         self.area_estatisticas.insert("1.0", texto_stats)
 
         # Atualizar gráfico também
-        if hasattr(self, 'canvas_grafico'):
+        if self.criar_grafico():
             self.atualizar_grafico()
+        else:
+            self.atualizar_resumo()
 
     def exportar_estatisticas(self):
         """Exportar estatísticas para arquivo"""
@@ -2218,6 +4459,9 @@ class MenuLateralApp:
 
         if arquivo:
             try:
+                self.obter_aba("estatisticas")
+                if self.estatisticas_alteradas():
+                    self.redesenhar_estatisticas()
                 conteudo = self.area_estatisticas.get("1.0", tk.END)
                 with open(arquivo, "w", encoding="utf-8") as f:
                     f.write(conteudo)
@@ -2225,12 +4469,28 @@ class MenuLateralApp:
             except Exception as e:
                 messagebox.showerror("Erro", f"Erro ao exportar: {e}")
 
+    def limpar_cache_chaves(self):
+        """Descartar as chaves derivadas mantidas em memória"""
+        self.cache_chaves.limpar()
+        self.encerrar_sessao_texto()
+        self.adicionar_ao_historico("Cache de chaves derivadas limpo", "SISTEMA")
+        self.atualizar_estatisticas()
+        messagebox.showinfo("Sucesso", "Cache de chaves limpo com sucesso!")
+
+    def alternar_medicao_fases(self):
+        """Ligar ou desligar a medição de tempo por fase do processamento de arquivos"""
+        cronometro.ativo = not cronometro.ativo
+        self.btn_fases.config(text=f"⏱️ Medir Fases: {'Ligado' if cronometro.ativo else 'Desligado'}")
+        self.adicionar_ao_historico(
+            f"Medição de fases {'ligada' if cronometro.ativo else 'desligada'}", "SISTEMA")
+
     def limpar_dados_estatisticas(self):
         """Limpar dados de estatísticas"""
         resultado = messagebox.askyesno("Limpar Dados",
                                         "Tem certeza que deseja limpar todos os dados estatísticos?")
         if resultado:
-            self.estatisticas = Estatisticas()
+            self.estatisticas.limpar()
+            cronometro.limpar()
             self.atualizar_estatisticas()
             messagebox.showinfo("Sucesso", "Dados estatísticos limpos com sucesso!")
 
@@ -2314,7 +4574,7 @@ class MenuLateralApp:
 
     def reproduzir_morse(self):
         """Reproduzir código morse como som"""
-        if not winsound_disponivel:
+        if not importar_opcional("winsound"):
             messagebox.showerror("Erro", "Biblioteca de som não disponível.")
             return
 
@@ -2346,6 +4606,7 @@ class MenuLateralApp:
 
     def tocar_morse(self, morse_code, dot_duration, dash_duration, frequencia):
         """Tocar código morse em thread separada"""
+        winsound = importar_opcional("winsound")
         try:
             for palavra in morse_code.split('   '):
                 for letra in palavra.split(' '):
@@ -2396,6 +4657,7 @@ class MenuLateralApp:
 
     def tocar_morse(self, morse_code, dot_duration, dash_duration, frequencia):
         """Tocar código morse em thread separada - VERSÃO ATUALIZADA COM PAUSA"""
+        winsound = importar_opcional("winsound")
         try:
             for palavra in morse_code.split('   '):
                 for letra in palavra.split(' '):
@@ -2482,11 +4744,12 @@ class MenuLateralApp:
 
     def atualizar_portas_seriais(self):
         """Atualizar lista de portas seriais"""
-        if not serial_disponivel:
+        list_ports = importar_opcional("serial.tools.list_ports")
+        if not list_ports:
             return
 
         try:
-            portas = list(serial.tools.list_ports.comports())
+            portas = list(list_ports.comports())
             if portas:
                 portas_str = [p.device for p in portas]
                 self.combo_portas['values'] = portas_str
@@ -2499,7 +4762,8 @@ class MenuLateralApp:
 
     def conectar_arduino(self):
         """Conectar ao Arduino"""
-        if not serial_disponivel:
+        serial = importar_opcional("serial")
+        if not serial:
             messagebox.showerror("Erro", "Biblioteca serial não disponível.")
             return
 
@@ -2607,9 +4871,11 @@ class MenuLateralApp:
         menu_principal.add_cascade(label="Operações", menu=menu_operacoes)
         menu_operacoes.add_command(label="Criptografar Texto", command=self.processar_texto)
         menu_operacoes.add_command(label="Descriptografar Texto", command=self.restaurar_texto)
+        menu_operacoes.add_command(label="Migrar Textos Antigos...", command=self.migrar_arquivo_textos_antigos)
         menu_operacoes.add_separator()
         menu_operacoes.add_command(label="Criptografar Arquivo", command=self.criptografar_arquivo)
         menu_operacoes.add_command(label="Descriptografar Arquivo", command=self.descriptografar_arquivo)
+        menu_operacoes.add_command(label="Ler Trecho de Arquivo", command=self.ler_trecho_arquivo)
         menu_operacoes.add_separator()
         menu_operacoes.add_command(label="Gerar Nova Chave", command=self.gerar_nova_chave)
 
@@ -2697,14 +4963,14 @@ class MenuLateralApp:
            - Conecte com Arduino para transmissão física
 
         SEGURANÇA:
-        - Algoritmo AES-256 com Fernet
+        - Algoritmo AES-256-GCM (textos e arquivos)
         - Chaves derivadas com PBKDF2-SHA256
         - 100.000 iterações para máxima segurança
         - Compatibilidade com versões anteriores
 
         DICAS IMPORTANTES:
         - Sempre faça backup antes de criptografar
-        - Descriptografe tudo antes de gerar nova chave
+        - Preserve 'chaveiro.key' ao gerar nova chave (chaves antigas)
         - Mantenha a chave em local seguro
         - Use senhas fortes quando necessário
 
@@ -2740,7 +5006,7 @@ class MenuLateralApp:
 
         🔒 SEGURANÇA:
         • Sempre faça backup dos arquivos originais
-        • Descriptografe tudo antes de gerar nova chave
+        • Preserve 'chaveiro.key' ao gerar nova chave
         • Mantenha a chave em local seguro
 
         ⚡ EFICIÊNCIA:
@@ -2846,7 +5112,7 @@ class MenuLateralApp:
         • Compatibilidade multiplataforma
 
         SEGURANÇA:
-        • Algoritmo Fernet (AES-256)
+        • Algoritmo AES-256-GCM
         • Derivação PBKDF2-SHA256
         • 100.000 iterações de hash
         • Chaves de 256 bits
@@ -2867,12 +5133,551 @@ class MenuLateralApp:
         tk.Button(frame_botoes, text="Fechar", command=sobre.destroy).pack(side="right")
 
 
+# Linha de comando (uso sem interface gráfica, ex.: servidores e cron)
+class SaidaCli:
+    """Progresso e resumo da linha de comando, em texto ou em JSON"""
+
+    def __init__(self, saida_json=False):
+        self.json = saida_json
+        self.medidor = MedidorProgresso()
+        self.ultimo_progresso = 0.0
+        self.terminal = sys.stderr.isatty()
+
+    def evento(self, **dados):
+        """Emitir um evento JSON por linha no stderr"""
+        if self.json:
+            print(json.dumps(dados, ensure_ascii=False), file=sys.stderr, flush=True)
+
+    def arquivo(self, resultado):
+        if self.json:
+            self.evento(evento="arquivo", caminho=resultado['caminho'], operacao=resultado['operacao'],
+                        status=resultado['status'], tamanho=resultado['tamanho'], erro=resultado['erro'],
+                        duplicata_de=resultado['duplicata_de'])
+        elif resultado['status'] != 'ok' or resultado['erro']:
+            # Um 'ok' com motivo é um aviso (ex.: arquivo que parecia um token Fernet)
+            motivo = f" ({resultado['erro']})" if resultado['erro'] else ""
+            print(f"\r{resultado['status'].upper()}: {resultado['caminho']}{motivo}", file=sys.stderr)
+
+    def progresso(self, atual, total, bytes_processados):
+        """Informar o progresso no máximo a cada INTERVALO_PROGRESSO"""
+        self.medidor.registrar(atual, bytes_processados)
+        agora = time.monotonic()
+        if atual < total and agora - self.ultimo_progresso < INTERVALO_PROGRESSO:
+            return
+        self.ultimo_progresso = agora
+
+        taxas = self.medidor.taxas() or (0.0, 0.0)
+        restante = self.medidor.tempo_restante(total - atual)
+        if self.json:
+            self.evento(evento="progresso", atual=atual, total=total, bytes=bytes_processados,
+                        bytes_s=round(taxas[0]), arquivos_s=round(taxas[1], 2),
+                        restante_s=None if restante is None else round(restante, 1))
+        elif self.terminal:
+            print(f"\r{atual}/{total} arquivos • {formatar_tamanho(taxas[0])}/s • {taxas[1]:.1f} arquivos/s",
+                  end="" if atual < total else "\n", file=sys.stderr, flush=True)
+
+    def resumo(self, dados):
+        """Resumo final no stdout"""
+        if self.json:
+            print(json.dumps(dados, ensure_ascii=False))
+            return
+        for chave, valor in dados.items():
+            if chave == 'fases':
+                for fase, medicao in valor.items():
+                    print(f"fase {fase}: {medicao['segundos']} s em {medicao['medicoes']} medições "
+                          f"(média {medicao['media_ms']} ms)")
+            else:
+                print(f"{chave}: {valor}")
+
+
+def formatar_tamanho(tamanho_bytes):
+    """Formatar tamanho em bytes para formato legível"""
+    for unidade in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if tamanho_bytes < 1024.0:
+            return f"{tamanho_bytes:.1f} {unidade}"
+        tamanho_bytes /= 1024.0
+    return f"{tamanho_bytes:.1f} PB"
+
+
+def criar_parser_cli():
+    """Definir os comandos da linha de comando"""
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument("--json", action="store_true",
+                       help="progresso em JSON (uma linha por evento, no stderr) e resumo em JSON no stdout")
+    comum.add_argument("--chave", default=ARQUIVO_CHAVE, help="arquivo da chave atual (padrão: %(default)s)")
+    comum.add_argument("--chaveiro", default=ARQUIVO_CHAVEIRO,
+                       help="arquivo com as chaves antigas (padrão: %(default)s)")
+    comum.add_argument("-p", "--processos", type=int, default=os.cpu_count() or 1,
+                       help="processos em paralelo (padrão: %(default)s)")
+    comum.add_argument("--fases", action="store_true",
+                       help="medir o tempo de leitura, criptografia, backup e escrita e incluí-lo no resumo")
+
+    parser = argparse.ArgumentParser(prog="CryptographiE",
+                                     description="Criptografia de arquivos, pastas e textos sem interface gráfica. "
+                                                 "Sem argumentos, abre a interface gráfica.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    arquivo = comandos.add_parser("arquivo", parents=[comum], help="criptografar ou descriptografar arquivos")
+    arquivo.add_argument("operacao", choices=["criptografar", "descriptografar"])
+    arquivo.add_argument("caminhos", nargs="+")
+    arquivo.add_argument("--sem-backup", action="store_true", help="não criar cópia .bak antes de criptografar")
+    arquivo.add_argument("--compressao", choices=sorted(CODECS_COMPRESSAO),
+                         help="comprimir antes de criptografar (ignorado em arquivos já comprimidos)")
+
+    pasta = comandos.add_parser("pasta", parents=[comum], help="criptografar ou descriptografar uma pasta")
+    pasta.add_argument("operacao", choices=["criptografar", "descriptografar"])
+    pasta.add_argument("pasta")
+    pasta.add_argument("--sem-subpastas", action="store_true", help="processar apenas o nível de cima")
+    pasta.add_argument("--sem-backup", action="store_true", help="não criar cópias .bak antes de criptografar")
+    pasta.add_argument("--incluir-backup", action="store_true", help="processar também arquivos .bak")
+    pasta.add_argument("--sem-manifesto", action="store_true",
+                       help="processar todos os arquivos, ignorando o manifesto incremental")
+    pasta.add_argument("--deduplicar", action="store_true",
+                       help="criptografar uma única vez arquivos de conteúdo idêntico (hash BLAKE2b)")
+    pasta.add_argument("--compressao", choices=sorted(CODECS_COMPRESSAO),
+                       help="comprimir antes de criptografar (ignorado em arquivos já comprimidos)")
+
+    verificar = comandos.add_parser("verificar", parents=[comum],
+                                    help="conferir a integridade de arquivos criptografados sem alterá-los")
+    verificar.add_argument("caminhos", nargs="+", help="arquivos ou pastas")
+    verificar.add_argument("--sem-subpastas", action="store_true")
+
+    intervalo = comandos.add_parser("intervalo", parents=[comum],
+                                    help="descriptografar só um trecho de um arquivo, sem alterá-lo")
+    intervalo.add_argument("caminho")
+    intervalo.add_argument("--inicio", type=int, default=0,
+                           help="primeiro byte do original; negativo conta a partir do fim (padrão: 0)")
+    intervalo.add_argument("--tamanho", type=int, help="quantidade de bytes (padrão: até o fim)")
+    intervalo.add_argument("-o", "--saida", help="arquivo de saída (padrão: stdout)")
+
+    texto = comandos.add_parser("texto", parents=[comum], help="criptografar ou descriptografar um texto",
+                                description="O texto vem de -t/--texto ou, se omitido, do stdin. "
+                                            "Exemplo: texto criptografar --senha x -t \"mensagem\"")
+    texto.add_argument("operacao", choices=["criptografar", "descriptografar"])
+    # Opção em vez de posicional opcional: o argparse consumiria o posicional vazio antes de --senha
+    texto.add_argument("-t", "--texto", help="texto de entrada (padrão: ler do stdin)")
+    texto.add_argument("--senha", help="senha personalizada")
+    texto.add_argument("--senha-env", metavar="VARIAVEL", help="ler a senha personalizada de uma variável de ambiente")
+    texto.add_argument("--base85", action="store_true", help="resultado em base85 (mais curto que base64)")
+    texto.add_argument("--lote", action="store_true",
+                       help="cada linha da entrada é uma mensagem; uma única derivação PBKDF2 por senha (modo sessão)")
+
+    benchmark = comandos.add_parser("benchmark", help="medir a vazão em corpora sintéticos (resultado em JSON)")
+    benchmark.add_argument("--escala", type=float, default=1.0,
+                           help="fator sobre o tamanho dos corpora e o número de repetições (padrão: %(default)s)")
+    benchmark.add_argument("--semente", type=int, default=2024, help="semente dos dados sintéticos")
+    benchmark.add_argument("-p", "--processos", type=int, default=os.cpu_count() or 1)
+    benchmark.add_argument("--saida", help="gravar o JSON neste arquivo em vez do stdout")
+
+    return parser
+
+
+def executar_lote_cli(tarefas, args, saida, manifesto=None):
+    """Processar as tarefas no motor paralelo, emitindo progresso e contabilizando o resultado"""
+    resumo = {'total': len(tarefas), 'ok': 0, 'ignorados': 0, 'erros': 0, 'deduplicados': 0, 'bytes': 0}
+    contadores = {'ok': 'ok', 'ignorado': 'ignorados', 'erro': 'erros'}
+    inicio = time.perf_counter()
+
+    try:
+        resultados = processar_com_deduplicacao(tarefas, args.processos, args.chave, args.chaveiro,
+                                                getattr(args, 'deduplicar', False),
+                                                getattr(args, 'compressao', None))
+        for i, resultado in enumerate(resultados, 1):
+            registrar_resultado_manifesto(manifesto, resultado)
+            resumo[contadores[resultado['status']]] += 1
+            if resultado['duplicata_de']:
+                resumo['deduplicados'] += 1
+            if resultado['status'] == 'ok':
+                resumo['bytes'] += resultado['tamanho']
+
+            saida.arquivo(resultado)
+            saida.progresso(i, len(tarefas), resumo['bytes'])
+    finally:
+        # O que já foi processado fica registrado mesmo após interrupção
+        if manifesto:
+            manifesto.salvar()
+
+    resumo['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumo
+
+
+def executar_intervalo_cli(args, saida):
+    """Gravar um trecho descriptografado em arquivo ou no stdout"""
+    if not os.path.exists(args.chave):
+        raise FileNotFoundError(f"Arquivo de chave não encontrado: {args.chave}")
+    chaveiro = carregar_chaveiro(args.chave, args.chaveiro)
+    inicio = time.perf_counter()
+
+    if args.saida:
+        # Arquivo temporário e troca: uma falha de autenticação não deixa saída parcial
+        fd, temporario = tempfile.mkstemp(prefix=".crye_", suffix=".tmp",
+                                          dir=os.path.dirname(os.path.abspath(args.saida)))
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                escritos = descriptografar_intervalo(args.caminho, chaveiro, args.inicio, args.tamanho, destino)
+            os.replace(temporario, args.saida)
+        except BaseException:
+            os.remove(temporario)
+            raise
+    else:
+        escritos = descriptografar_intervalo(args.caminho, chaveiro, args.inicio, args.tamanho, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+
+    resumo = {'comando': args.comando, 'caminho': args.caminho, 'inicio': args.inicio, 'bytes': escritos,
+              'segundos': round(time.perf_counter() - inicio, 3)}
+    if args.saida:
+        resumo['saida'] = args.saida
+        saida.resumo(resumo)
+    else:
+        # O stdout leva o conteúdo; o resumo vai como evento no stderr
+        saida.evento(evento="resumo", **resumo)
+    return 0
+
+
+def executar_lote_texto_cli(cifrador, args, linhas, senha, codificacao, saida):
+    """Criptografar ou descriptografar uma mensagem por linha, no modo sessão"""
+    inicio = time.perf_counter()
+    if args.operacao == "criptografar":
+        resultados = [(texto, None) for texto in cifrador.criptografar_textos(linhas, senha, codificacao)]
+    else:
+        resultados = cifrador.descriptografar_textos(linhas, senha)
+
+    erros = 0
+    for linha, (resultado, erro) in enumerate(resultados, 1):
+        if erro:
+            erros += 1
+            saida.evento(evento="erro", linha=linha, erro=erro)
+            if not args.json:
+                print(f"Linha {linha}: {erro}", file=sys.stderr)
+        elif not args.json:
+            print(resultado)
+
+    if args.json:
+        saida.resumo({'operacao': args.operacao, 'total': len(resultados), 'erros': erros,
+                      'segundos': round(time.perf_counter() - inicio, 3),
+                      'resultados': [resultado for resultado, _ in resultados]})
+    return 1 if erros else 0
+
+
+# Benchmark reprodutível de vazão (comando "benchmark")
+VERSAO_APLICATIVO = "2.1"
+
+
+def percentis(valores, niveis=(50, 90, 99)):
+    """Percentis pelo método do posto mais próximo, em milissegundos"""
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+    resultado = {f"p{nivel}": round(ordenados[min(len(ordenados) - 1, math.ceil(nivel / 100 * len(ordenados)) - 1)]
+                                    * 1000, 3) for nivel in niveis}
+    resultado['max'] = round(ordenados[-1] * 1000, 3)
+    return resultado
+
+
+def pico_memoria_mb():
+    """Pico de memória residente (RSS) deste processo e dos filhos, quando disponível
+
+    O valor é cumulativo desde o início do processo; por isso cada cenário do benchmark
+    roda no seu próprio processo (medir_em_processo).
+    """
+    resource = importar_opcional("resource")
+    if not resource:
+        return None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    escala = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        'processo': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / escala, 1),
+        'filhos': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / escala, 1)
+    }
+
+
+def medir_vazao(tamanho_total, arquivos, segundos, latencias=None):
+    medida = {
+        'segundos': round(segundos, 4),
+        'mb_s': round(tamanho_total / (1024 * 1024) / segundos, 2) if segundos else None,
+        'arquivos_s': round(arquivos / segundos, 2) if segundos else None
+    }
+    if latencias is not None:
+        medida['latencia_ms'] = percentis(latencias)
+    return medida
+
+
+def _executar_cenario(fila, funcao, argumentos, metodo_inicio):
+    # Pools do cenário usam o mesmo método de início do aplicativo, como processos filhos deste
+    multiprocessing.set_start_method(metodo_inicio, force=True)
+    try:
+        medida = funcao(*argumentos)
+        medida['pico_rss_mb'] = pico_memoria_mb()
+        fila.put((medida, None))
+    except Exception as e:
+        fila.put((None, f"{type(e).__name__}: {e}"))
+
+
+def medir_em_processo(funcao, *argumentos):
+    """Rodar um cenário do benchmark em um processo novo, com o pico de memória só dele"""
+    # O processo não pode herdar a memória (nem o pico de RSS) do pai; no Linux, até o spawn
+    # herda o pico por ser um fork seguido de exec, então o forkserver é preferido
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_executar_cenario, args=(fila, funcao, argumentos, multiprocessing.get_start_method()))
+    processo.start()
+    medida, erro = fila.get()
+    processo.join()
+    if erro:
+        raise RuntimeError(f"Cenário {funcao.__name__} falhou: {erro}")
+    return medida
+
+
+def _benchmark_pbkdf2(salts):
+    latencias = []
+    for salt in salts:
+        inicio = time.perf_counter()
+        hashlib.pbkdf2_hmac('sha256', b"senha de benchmark", salt, ITERACOES_PBKDF2, dklen=32)
+        latencias.append(time.perf_counter() - inicio)
+    return {'iteracoes': ITERACOES_PBKDF2, 'derivacoes': len(latencias),
+            'derivacoes_s': round(len(latencias) / sum(latencias), 2),
+            'latencia_ms': percentis(latencias)}
+
+
+def _benchmark_texto(mensagens, senha, sessao=False):
+    cifrador = CifradorTexto()
+    tamanho_total = sum(len(m) for m in mensagens)
+    if sessao:
+        # Modo sessão: uma derivação PBKDF2 para todo o lote e HKDF por mensagem
+        inicio = time.perf_counter()
+        cifrador.criptografar_textos(mensagens, senha)
+        return medir_vazao(tamanho_total, len(mensagens), time.perf_counter() - inicio)
+
+    latencias = []
+    for mensagem in mensagens:
+        inicio = time.perf_counter()
+        cifrador.criptografar_texto(mensagem, senha)
+        latencias.append(time.perf_counter() - inicio)
+    return medir_vazao(tamanho_total, len(mensagens), sum(latencias), latencias)
+
+
+def _benchmark_arquivos(caminhos, tamanho_total, operacao, caminho_chave, processos):
+    """Arquivo a arquivo, na thread principal (latência por arquivo)"""
+    chaveiro = como_chaveiro(carregar_chave(caminho_chave))
+    funcao = criptografar_arquivo_em_disco if operacao == 'criptografar' else descriptografar_arquivo_em_disco
+    latencias = []
+    for caminho in caminhos:
+        inicio = time.perf_counter()
+        funcao(caminho, chaveiro, processos)
+        latencias.append(time.perf_counter() - inicio)
+    return medir_vazao(tamanho_total, len(caminhos), sum(latencias), latencias)
+
+
+def _benchmark_pasta(caminhos, tamanho_total, operacao, caminho_chave, caminho_chaveiro, processos):
+    """Pasta inteira pelo motor paralelo (latência: tempo de cada arquivo medido no processo do pool)"""
+    tarefas = [(caminho, operacao, False) for caminho in caminhos]
+    inicio = time.perf_counter()
+    latencias = [resultado['segundos']
+                 for resultado in processar_em_paralelo(tarefas, processos, caminho_chave, caminho_chaveiro)]
+    return medir_vazao(tamanho_total, len(caminhos), time.perf_counter() - inicio, latencias)
+
+
+def gerar_conteudo_benchmark(gerador, tamanho, compressivel):
+    """Conteúdo sintético determinístico: linhas de log (compressível) ou bytes aleatórios"""
+    if not compressivel:
+        return gerador.randbytes(tamanho)
+
+    linhas = []
+    total = 0
+    while total < tamanho:
+        linha = (f"{gerador.randrange(10 ** 9):09d},usuario{gerador.randrange(500)},"
+                 f"{gerador.choice(['LOGIN', 'LOGOUT', 'UPLOAD', 'DOWNLOAD'])},{gerador.random():.6f}\n")
+        linhas.append(linha)
+        total += len(linha)
+    return "".join(linhas).encode()[:tamanho]
+
+
+def gerar_corpus_benchmark(pasta, gerador, quantidade, tamanho_minimo, tamanho_maximo, compressivel):
+    """Criar arquivos com tamanhos log-uniformes entre o mínimo e o máximo"""
+    os.makedirs(pasta)
+    caminhos = []
+    for i in range(quantidade):
+        tamanho = int(math.exp(gerador.uniform(math.log(tamanho_minimo), math.log(tamanho_maximo))))
+        caminho = os.path.join(pasta, f"arquivo_{i:06d}.dat")
+        with open(caminho, "wb") as f:
+            f.write(gerar_conteudo_benchmark(gerador, tamanho, compressivel))
+        caminhos.append(caminho)
+    return caminhos
+
+
+def executar_benchmark(escala=1.0, semente=2024, processos=None):
+    """Medir texto, PBKDF2, arquivos e pastas sobre corpora sintéticos; retorna um dicionário
+
+    Os dados são gerados aqui e cada cenário roda em um processo próprio, então o
+    campo 'pico_rss_mb' de cada medida reflete apenas aquele cenário.
+    """
+    processos = processos or os.cpu_count() or 1
+    gerador = random.Random(semente)
+    resultados = {}
+
+    def etapa(nome):
+        print(f"[benchmark] {nome}...", file=sys.stderr, flush=True)
+
+    # Derivação PBKDF2 (sem cache: um salt novo por derivação)
+    etapa("pbkdf2")
+    salts = [gerador.randbytes(16) for _ in range(max(1, int(20 * escala)))]
+    resultados['pbkdf2'] = medir_em_processo(_benchmark_pbkdf2, salts)
+
+    # Criptografia de texto (uma derivação por mensagem, como na interface)
+    etapa("texto")
+    mensagens = [gerar_conteudo_benchmark(gerador, 200, True).decode() for _ in range(max(1, int(20 * escala)))]
+    for nome, senha in (("texto_criptografar", None), ("texto_criptografar_senha", "senha de benchmark")):
+        resultados[nome] = medir_em_processo(_benchmark_texto, mensagens, senha)
+    resultados['texto_criptografar_sessao'] = medir_em_processo(_benchmark_texto, mensagens * 50,
+                                                                "senha de benchmark", True)
+
+    corpora = {
+        'pequenos': (int(2000 * escala), 64, 4 * 1024, False),
+        'mistos_compressivel': (int(200 * escala), 1024, 8 * 1024 * 1024, True),
+        'mistos_aleatorio': (int(200 * escala), 1024, 8 * 1024 * 1024, False),
+        'grandes': (max(1, int(2 * escala)), int(96 * 1024 * 1024 * escala), int(128 * 1024 * 1024 * escala), False)
+    }
+
+    with tempfile.TemporaryDirectory(prefix="cryptographie_benchmark_") as base:
+        # Chave descartável: o benchmark não toca na chave do usuário
+        caminho_chave = os.path.join(base, ARQUIVO_CHAVE)
+        caminho_chaveiro = os.path.join(base, ARQUIVO_CHAVEIRO)
+        carregar_chave(caminho_chave)
+
+        for nome, (quantidade, minimo, maximo, compressivel) in corpora.items():
+            etapa(f"corpus {nome}")
+            caminhos = gerar_corpus_benchmark(os.path.join(base, nome), gerador, max(1, quantidade),
+                                              max(1, minimo), max(2, maximo), compressivel)
+            tamanho_total = sum(os.path.getsize(caminho) for caminho in caminhos)
+            medidas = {'arquivos': len(caminhos), 'bytes': tamanho_total, 'compressivel': compressivel}
+
+            for operacao in ('criptografar', 'descriptografar'):
+                medidas[f"arquivo_{operacao}"] = medir_em_processo(_benchmark_arquivos, caminhos, tamanho_total,
+                                                                   operacao, caminho_chave, processos)
+            for operacao in ('criptografar', 'descriptografar'):
+                medidas[f"pasta_{operacao}"] = medir_em_processo(_benchmark_pasta, caminhos, tamanho_total, operacao,
+                                                                 caminho_chave, caminho_chaveiro, processos)
+
+            resultados[nome] = medidas
+            shutil.rmtree(os.path.join(base, nome))
+
+    return {
+        'aplicativo': VERSAO_APLICATIVO,
+        'data': datetime.datetime.now().isoformat(timespec="seconds"),
+        'maquina': {
+            'sistema': platform.platform(),
+            'processador': platform.processor() or platform.machine(),
+            'cpus': os.cpu_count(),
+            'python': platform.python_version()
+        },
+        'parametros': {'escala': escala, 'semente': semente, 'processos': processos},
+        'resultados': resultados
+    }
+
+
+def executar_cli(argv):
+    """Executar um comando da linha de comando; retorna o código de saída"""
+    args = criar_parser_cli().parse_args(argv)
+    if args.comando == "benchmark":
+        relatorio = json.dumps(executar_benchmark(args.escala, args.semente, args.processos),
+                               ensure_ascii=False, indent=2)
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                f.write(relatorio + "\n")
+        else:
+            print(relatorio)
+        return 0
+
+    saida = SaidaCli(args.json)
+    cronometro.ativo = args.fases
+
+    try:
+        if args.comando == "texto":
+            senha = args.senha or (os.environ.get(args.senha_env) if args.senha_env else None)
+            entrada = args.texto if args.texto is not None else sys.stdin.read()
+            cifrador = CifradorTexto()
+            codificacao = 'base85' if args.base85 else 'base64'
+            if args.lote:
+                return executar_lote_texto_cli(cifrador, args, entrada.splitlines(), senha, codificacao, saida)
+            if args.operacao == "criptografar":
+                resultado = cifrador.criptografar_texto(entrada, senha, codificacao)
+            else:
+                resultado = cifrador.descriptografar_texto(entrada.strip(), senha)
+
+            if args.json:
+                saida.resumo({'operacao': args.operacao, 'resultado': resultado})
+            else:
+                print(resultado)
+            return 0
+
+        if args.comando == "intervalo":
+            return executar_intervalo_cli(args, saida)
+
+        if args.comando == "verificar" or args.operacao == "descriptografar":
+            # Descriptografar ou verificar com uma chave nova nunca daria certo
+            if not os.path.exists(args.chave):
+                raise FileNotFoundError(f"Arquivo de chave não encontrado: {args.chave}")
+
+        # Garante que a chave exista antes de os processos a carregarem
+        carregar_chave(args.chave)
+        manifesto = None
+        inalterados = 0
+
+        if args.comando == "arquivo":
+            backup = args.operacao == "criptografar" and not args.sem_backup
+            tarefas = [(caminho, args.operacao, backup) for caminho in args.caminhos]
+        elif args.comando == "pasta":
+            encontrados, caminhos, manifesto = selecionar_arquivos_pasta(
+                args.pasta, args.operacao, not args.sem_subpastas, args.incluir_backup, not args.sem_manifesto)
+            inalterados = len(encontrados) - len(caminhos)
+            backup = args.operacao == "criptografar" and not args.sem_backup
+            tarefas = [(caminho, args.operacao, backup) for caminho in caminhos]
+        else:
+            caminhos = []
+            for caminho in args.caminhos:
+                if os.path.isdir(caminho):
+                    caminhos.extend(arquivo for arquivo, _ in coletar_arquivos(caminho, not args.sem_subpastas))
+                else:
+                    caminhos.append(caminho)
+            tarefas = [(caminho, 'verificar', False) for caminho in caminhos]
+
+        resumo = {'comando': args.comando, 'operacao': getattr(args, 'operacao', 'verificar')}
+        resumo.update(executar_lote_cli(tarefas, args, saida, manifesto))
+        if args.comando == "pasta":
+            resumo['inalterados'] = inalterados
+        if args.fases:
+            resumo['fases'] = cronometro.resumo()
+        saida.resumo(resumo)
+        return 1 if resumo['erros'] else 0
+
+    except KeyboardInterrupt:
+        saida.evento(evento="interrompido")
+        return 130
+    except Exception as e:
+        if args.json:
+            saida.resumo({'comando': args.comando, 'erro': str(e)})
+        else:
+            print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+
 # Função principal para executar o aplicativo
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        # Com argumentos, roda na linha de comando sem abrir janelas
+        return executar_cli(argv)
+
     try:
         root = tk.Tk()
         app = MenuLateralApp(root)
         root.mainloop()
+
+        # Gravar o que ainda estiver pendente
+        app.estatisticas.salvar()
+        if app.registro_operacoes:
+            app.registro_operacoes.descarregar()
     except ImportError as e:
         messagebox.showerror("Erro de Dependência",
                              "Biblioteca 'cryptography' não encontrada!\n\n" +
@@ -2884,4 +5689,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file